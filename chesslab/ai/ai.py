@@ -12,14 +12,352 @@ The helper `choose_random_move` is provided for you.
 
 from __future__ import annotations
 
+import os
 import random
+import time
+from array import array
+from operator import methodcaller
 from typing import Optional, Tuple
 
-from ..common.profiling import Counter
+import numpy as np
+
+from ..board import Move
+
+# This file is submitted on its own, so it cannot count on the helpers that
+# were added next to it; each one has a local stand-in
+try:
+    from ..board import PieceSquareTables
+except ImportError:
+    class PieceSquareTables:
+        """The (mg, eg, phase) per-square tables; see build_psqt."""
+        def __init__(self, mg, eg, phase):
+            self.mg, self.eg, self.phase = mg, eg, phase
+
+try:
+    from ..common.profiling import Counter, timed, timed_iter
+except ImportError:
+    from ..common.profiling import Counter
+
+    def timed(func, store, name):
+        """func wrapped to add its run time (ms) to store[name]."""
+        def wrapper(*args):
+            t0 = time.perf_counter()
+            result = func(*args)
+            store[name] = store.get(name, 0.0) + (time.perf_counter() - t0) * 1000.0
+            return result
+        return wrapper
+
+    def timed_iter(func, store, name):
+        """Like timed() for a generator function: times each step."""
+        def wrapper(*args):
+            it = func(*args)
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    store[name] = store.get(name, 0.0) + (time.perf_counter() - t0) * 1000.0
+                    return
+                store[name] = store.get(name, 0.0) + (time.perf_counter() - t0) * 1000.0
+                yield item
+        return wrapper
 
 MoveType = Tuple[Tuple[int, int], Tuple[int, int], Optional[str]]
 
-TRANSPOSITION_TABLE = {}
+# Transposition table (kept in this file so it works when submitted alone;
+# chesslab/ai/tt.py re-exports it for the rest of the package)
+#
+# The table is one preallocated array of unsigned 64-bit words, so its memory
+# use is set once at construction and never grows. Each entry takes two words:
+#
+#     check = key ^ data
+#     data  = move (13 bits) | depth (8) | flag (2) | generation (6) | score (32)
+#
+# Storing the key XORed with the data means a torn or colliding entry simply
+# fails the `check ^ data == key` test on probe. Entries are grouped in buckets
+# of two indexed by the low bits of the Zobrist key:
+#   * slot 0 is depth-preferred: it is only overwritten by a search at least as
+#     deep, or when its entry is from an older generation (age-based eviction);
+#   * slot 1 is always-replace and takes everything slot 0 turns away.
+#
+# Call `new_search()` at the start of each search to age out old entries.
+
+# Bound types stored with each score
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
+
+ENTRY_BYTES = 16
+BUCKET_ENTRIES = 2
+DEFAULT_SIZE_MB = 16
+
+_MOVE_MASK = 0x1FFF
+_PROMO_BIT = 1 << 12
+_DEPTH_SHIFT, _FLAG_SHIFT, _AGE_SHIFT, _SCORE_SHIFT = 13, 21, 23, 32
+_SCORE_BIAS = 1 << 31
+_SCORE_LIMIT = _SCORE_BIAS - 1
+_SAMPLE_SLOTS = 2000
+
+TTEntry = Tuple[int, int, int, int]  # (depth, value, flag, move code)
+
+
+def encode_move(move) -> int:
+    """Pack a Move into 13 bits (src square, dst square, promotion flag); 0 means no move."""
+    if move is None:
+        return 0
+    (r1, c1), (r2, c2), promote = move
+    return ((r1 * 8 + c1) << 6) | (r2 * 8 + c2) | (_PROMO_BIT if promote else 0)
+
+
+def decode_move(code: int) -> Optional[Move]:
+    """Inverse of encode_move."""
+    if not code:
+        return None
+    src, dst = (code >> 6) & 63, code & 63
+    return Move((src >> 3, src & 7), (dst >> 3, dst & 7), 'Q' if code & _PROMO_BIT else None)
+
+
+class TranspositionTable:
+    """
+    Bucketed, fixed-size transposition table keyed by Board.zobrist.
+
+    `size_mb` is rounded down to a power-of-two number of buckets. Pass
+    `buffer` (any writable buffer of at least `nbytes(size_mb)` bytes, e.g. a
+    multiprocessing.shared_memory block) to place the table in existing
+    memory instead of allocating it.
+    """
+
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB, buffer=None):
+        self.buckets = self.bucket_count(size_mb)
+        self.mask = self.buckets - 1
+        words = self.buckets * BUCKET_ENTRIES * 2
+        if buffer is None:
+            self.table = array('Q', bytes(words * 8))
+        else:
+            self.table = memoryview(buffer).cast('B')[:words * 8].cast('Q')
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    @staticmethod
+    def bucket_count(size_mb: float) -> int:
+        buckets = max(1, int(size_mb * (1 << 20)) // (ENTRY_BYTES * BUCKET_ENTRIES))
+        return 1 << (buckets.bit_length() - 1)
+
+    @classmethod
+    def nbytes(cls, size_mb: float) -> int:
+        return cls.bucket_count(size_mb) * BUCKET_ENTRIES * ENTRY_BYTES
+
+    def new_search(self):
+        """Start a new generation: entries from earlier searches become replaceable."""
+        self.generation = (self.generation + 1) & 63
+
+    def clear(self):
+        """Wipe every entry and reset the statistics."""
+        self.table[:] = array('Q', bytes(len(self.table) * 8))
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """Return (depth, value, flag, move code) for key, or None on a miss."""
+        self.probes += 1
+        t = self.table
+        i = (key & self.mask) << 2
+        for j in (i, i + 2):
+            data = t[j + 1]
+            if data and t[j] ^ data == key:
+                self.hits += 1
+                return ((data >> _DEPTH_SHIFT) & 0xFF, (data >> _SCORE_SHIFT) - _SCORE_BIAS,
+                        (data >> _FLAG_SHIFT) & 3, data & _MOVE_MASK)
+        return None
+
+    def store(self, key: int, depth: int, value, flag: int, move: int = 0):
+        """Store a search result; `move` is an encode_move() code."""
+        self.stores += 1
+        value = int(max(-_SCORE_LIMIT, min(_SCORE_LIMIT, value)))
+        data = (move | (min(max(depth, 0), 255) << _DEPTH_SHIFT) | (flag << _FLAG_SHIFT)
+                | (self.generation << _AGE_SHIFT) | ((value + _SCORE_BIAS) << _SCORE_SHIFT))
+        t = self.table
+        i = (key & self.mask) << 2
+        old = t[i + 1]
+        if (not old or t[i] ^ old == key or (old >> _AGE_SHIFT) & 63 != self.generation
+                or depth >= (old >> _DEPTH_SHIFT) & 0xFF):
+            j = i
+        else:
+            j = i + 2
+        t[j] = key ^ data
+        t[j + 1] = data
+
+    def release(self):
+        """Drop the view of an external `buffer` so its owner (e.g. a SharedMemory) can be closed."""
+        if isinstance(self.table, memoryview):
+            self.table.release()
+
+    def fill_rate(self) -> float:
+        """Fraction of occupied slots, sampled from the start of the table."""
+        t = self.table
+        n = min(len(t) // 2, _SAMPLE_SLOTS)
+        return sum(1 for j in range(n) if t[2 * j + 1]) / n
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'size_mb': len(self.table) * 8 / (1 << 20),
+            'entries': len(self.table) // 2,
+            'probes': self.probes,
+            'hits': self.hits,
+            'stores': self.stores,
+            'hit_rate': self.hit_rate(),
+            'fill_rate': self.fill_rate(),
+        }
+
+
+# Fixed-size table: memory stays at TT_SIZE_MB however long the search runs
+TT_SIZE_MB = 16
+
+# Deepest ply the per-ply search tables (killer moves) cover
+MAX_PLY = 64
+
+# History scores are halved when one passes this, so recent cutoffs count most
+HISTORY_MAX = 1 << 20
+
+# Scores beyond this are mates (checkmate scores 1000000 plus the remaining depth)
+MATE_BOUND = 900000
+
+# Forward pruning in choose_move's iterative deepening; each can be switched
+# off here or per Engine. choose_alphabeta_move on its own never prunes
+# (forward_pruning=False), so it returns the same value as minimax at equal depth
+NULL_MOVE_PRUNING = True
+LATE_MOVE_REDUCTIONS = True
+FUTILITY_PRUNING = True
+
+# Null move: depth reduction R, searched only with more than R plies left
+NULL_MOVE_R = 2
+# LMR: moves searched at full depth before reducing, and the least depth that reduces
+LMR_FULL_MOVES = 3
+LMR_MIN_DEPTH = 3
+# Futility: a quiet move one ply from the horizon is skipped when the static
+# eval plus this margin (centipawns) still cannot reach alpha
+FUTILITY_MARGIN = 200
+
+# Nodes searched between checks of an engine's stop flag
+STOP_POLL_NODES = 1024
+
+class SearchStopped(Exception):
+    """Raised out of a search when its engine's stop flag is set."""
+
+class Engine:
+    """
+    Search state that survives from one move to the next.
+
+    The harness keeps this module loaded in one process for the whole game,
+    so the transposition table and the move-ordering tables learned while
+    choosing the last move are still here for the next one. When the root
+    position changes (a new move) the table moves to a new generation, so old
+    entries are still probed but are the first to be replaced, the killers
+    shift down two plies to line up with the new root, and the history
+    scores are halved.
+
+    The ordering tables all hold quiet moves that caused beta cutoffs:
+      * killers: two per ply,
+      * history: a butterfly table, a score per (side, from, to) that grows
+        by depth^2 with each cutoff (and shrinks by as much for the quiet
+        moves searched before the cutoff move) and orders the remaining
+        quiet moves,
+      * countermoves: the last cutoff move played in reply to each
+        (from, to) move of the opponent.
+    """
+
+    def __init__(self, tt_size_mb=TT_SIZE_MB, tt=None, stop=None,
+                 null_move=None, lmr=None, futility=None):
+        # Pass `tt` to share a table (e.g. one in shared memory) between engines
+        self.tt = tt if tt is not None else TranspositionTable(tt_size_mb)
+        # Two killer slots per ply (encode_move codes), newest first
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        # Indexed by side * 4096 + (encode_move(move) & 4095), i.e. from * 64 + to
+        self.history = [0] * 8192
+        # Indexed by the opponent's previous move, from * 64 + to; holds encode_move codes
+        self.countermoves = [0] * 4096
+        self.root_key = None
+        # Root value (White's view) of the last completed search, for aspiration windows
+        self.score = None
+        # Anything with a truthy `.value` (e.g. a multiprocessing.Value) when the search should stop
+        self.stop = stop
+        # Forward pruning switches (None = the module default)
+        self.null_move = NULL_MOVE_PRUNING if null_move is None else null_move
+        self.lmr = LATE_MOVE_REDUCTIONS if lmr is None else lmr
+        self.futility = FUTILITY_PRUNING if futility is None else futility
+        # Whether the TT entries came from forward-pruned searches (None: empty table)
+        self.tt_pruned = None
+
+    def start_search(self, board):
+        """Call at the root of every search; ages the tables when the root is a new position."""
+        key = board.zobrist
+        if key != self.root_key:
+            self.root_key = key
+            self.tt.new_search()
+            self.killers = self.killers[2:] + [[0, 0], [0, 0]]
+            self.history[:] = [h >> 1 for h in self.history]
+
+    def reset(self):
+        """Forget everything, e.g. before an unrelated game or a benchmark."""
+        self.tt.clear()
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history[:] = [0] * 8192
+        self.countermoves[:] = [0] * 4096
+        self.root_key = None
+        self.score = None
+        self.tt_pruned = None
+
+ENGINE = Engine()
+
+# Processes used by choose_move; more than one runs a Lazy SMP search (see smp.py).
+# main.py --search-workers sets this through the environment.
+SEARCH_WORKERS = int(os.environ.get('CHESSLAB_SEARCH_WORKERS', '1'))
+_SMP = None
+
+# Opening book file used by choose_move (see chesslab/book.py): main.py --book
+# sets it through the environment, otherwise book.bin next to this file if present
+BOOK_PATH = os.environ.get('CHESSLAB_BOOK') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+_BOOK = None
+
+def book_move(board):
+    """A move from the opening book for board, or None (also when there is no book)."""
+    global _BOOK
+    if _BOOK is None:
+        _BOOK = False
+        if BOOK_PATH and os.path.exists(BOOK_PATH):
+            try:
+                from ..book import OpeningBook
+                _BOOK = OpeningBook(BOOK_PATH)
+            except (OSError, ValueError):
+                pass
+    return _BOOK.choose(board) if _BOOK else None
+
+# Endgame tablebases (see chesslab/tablebase.py): main.py --tablebases sets the
+# directory through the environment, otherwise tablebases/ next to this file if present
+TABLEBASE_PATH = (os.environ.get('CHESSLAB_TABLEBASES')
+                  or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases'))
+_TABLEBASES = None
+
+# Tablebase wins score TB_WIN minus the plies to mate: past MATE_BOUND, so the
+# search treats them as mates, but below the mates it finds itself
+TB_WIN = 950000
+# The search probes the tables only when the root has at most this many pieces
+TB_PROBE_PIECES = 6
+
+def tablebases():
+    """The Tablebases in TABLEBASE_PATH, or False if there are none."""
+    global _TABLEBASES
+    if _TABLEBASES is None:
+        _TABLEBASES = False
+        if TABLEBASE_PATH and os.path.isdir(TABLEBASE_PATH):
+            from ..tablebase import Tablebases
+            found = Tablebases(TABLEBASE_PATH)
+            if found:
+                _TABLEBASES = found
+    return _TABLEBASES
 
 def choose_random_move(board):
     """Return a uniformly random legal move or None if no moves exist."""
@@ -117,13 +455,64 @@ KING_END_GAME_TABLE = [
     [-50,-30,-30,-30,-30,-30,-30,-50]
 ]
 
+# Game-phase weight of each piece type; the starting position sums to PHASE_MAX
+PHASE_WEIGHTS = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+PHASE_MAX = 24
+
+def build_psqt():
+    """
+    Fold PIECE_VALUES and the piece-square tables into the signed per-square
+    tables that Board.make/unmake sum incrementally. Middlegame and endgame
+    tables differ only for the king.
+    """
+    mg_tables = {
+        'P': PAWN_TABLE, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
+        'R': ROOK_TABLE, 'Q': QUEEN_TABLE, 'K': KING_MIDDLE_GAME_TABLE
+    }
+    eg_tables = dict(mg_tables, K=KING_END_GAME_TABLE)
+    mg, eg, phase = {}, {}, {}
+    for piece_type, value in PIECE_VALUES.items():
+        for color, sign in (('w', 1), ('b', -1)):
+            piece = color + piece_type
+            # Black's score is found by flipping the row
+            rows = range(8) if color == 'w' else range(7, -1, -1)
+            mg[piece] = [sign * (value + mg_tables[piece_type][r][c]) for r in rows for c in range(8)]
+            eg[piece] = [sign * (value + eg_tables[piece_type][r][c]) for r in rows for c in range(8)]
+            phase[piece] = PHASE_WEIGHTS[piece_type]
+    return PieceSquareTables(mg, eg, phase)
+
+PSQT = build_psqt()
+
+def scan_psqt(board):
+    """(mg, eg, phase) totals of board computed from scratch."""
+    mg = eg = phase = 0
+    for pc, r, c in board.occupied():
+        mg += PSQT.mg[pc][r * 8 + c]
+        eg += PSQT.eg[pc][r * 8 + c]
+        phase += PSQT.phase[pc]
+    return mg, eg, phase
+
+def prepare_board(board):
+    """
+    Attach the evaluation tables to a search root so make/unmake keep the
+    totals up to date. Call before searching; the search must not unmake
+    moves played before this call.
+    """
+    if board.psqt is not PSQT:
+        board.set_psqt(PSQT)
+    return board
+
 def evaluate(board):
     """
     Return a heuristic score from White's perspective.
     This improved version includes:
     1. Material count (using centipawns)
-    2. Piece-Square Tables for positional awareness
+    2. Piece-Square Tables for positional awareness, tapered between the
+       middlegame and endgame king tables by game phase
     3. Check penalties/bonuses
+
+    Material and piece-square totals are kept up to date by Board.make/unmake,
+    so this is a constant-time read rather than a board scan.
     """
     # Check for game checkmate/stalemate immediately
     outcome = board.outcome()
@@ -133,55 +522,18 @@ def evaluate(board):
         else:
             return 0 # Stalemate
 
-    score = 0
-    white_material = 0
-    black_material = 0
-    
-    PIECE_TABLES = {
-        'P': PAWN_TABLE, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
-        'R': ROOK_TABLE, 'Q': QUEEN_TABLE
-    }
-
-    # Efficient board scan
-    for r in range(8):
-        for c in range(8):
-            piece = board.piece_at(r, c)
-            if not piece:
-                continue
+    if board.psqt is PSQT:
+        mg, eg, phase = board.mg_score, board.eg_score, board.phase
+    elif not board.history:
+        # Boards built elsewhere (or unpickled in a worker) rescan once
+        board.set_psqt(PSQT)
+        mg, eg, phase = board.mg_score, board.eg_score, board.phase
+    else:
+        # Attaching here would leave earlier undo records with stale totals
+        mg, eg, phase = scan_psqt(board)
 
-            color = piece[0]
-            piece_type = piece[1]
-            
-            # lookup material
-            material_value = PIECE_VALUES.get(piece_type, 0)
-            
-            # lookup position
-            positional_score = 0
-            if piece_type in PIECE_TABLES:
-                if color == 'w':
-                    positional_score = PIECE_TABLES[piece_type][r][c]
-                else:
-                    positional_score = PIECE_TABLES[piece_type][7 - r][c]
-                
-                if color == 'w': white_material += material_value
-                else: black_material += material_value
-
-            elif piece_type == 'K':
-                # Determine game phase based on material
-                total_material = (white_material + black_material) / 100
-                is_endgame = total_material < 20
-                
-                table = KING_END_GAME_TABLE if is_endgame else KING_MIDDLE_GAME_TABLE
-                if color == 'w':
-                    positional_score = table[r][c]
-                else:
-                    positional_score = table[7 - r][c]
-
-            # Accumulate score
-            if color == 'w':
-                score += material_value + positional_score
-            else:
-                score -= (material_value + positional_score)
+    phase = min(phase, PHASE_MAX)
+    score = (mg * phase + eg * (PHASE_MAX - phase)) // PHASE_MAX
     
     # Check Bonuses/Penalties
     if board.is_check('w'):
@@ -191,49 +543,220 @@ def evaluate(board):
 
     return score
 
-def choose_minimax_move(board, depth=2, metrics=None):
+# Batch evaluation with NumPy, for analysis and tuning over many positions.
+# A position is encoded as 64 int8 codes, one per square (r * 8 + c): 0 for
+# empty, 1..6 for a white pawn, knight, bishop, rook, queen, king and
+# -1..-6 for the same black pieces.
+BATCH_PIECES = 'PNBRQK'
+BATCH_CODES = {color + piece: sign * (i + 1)
+               for color, sign in (('w', 1), ('b', -1)) for i, piece in enumerate(BATCH_PIECES)}
+# Positions evaluated per step, so the (chunk, 64) temporaries stay small
+BATCH_CHUNK = 1 << 13
+
+def encode_boards(boards):
+    """The int8 (N, 64) encoding of a sequence of boards."""
+    code = BATCH_CODES.get
+    # Both board backends keep the 8x8 grid of piece strings (None for empty)
+    flat = [code(pc, 0) for board in boards for row in board.board for pc in row]
+    return np.array(flat, dtype=np.int8).reshape(len(boards), 64)
+
+def build_batch_tables(psqt=PSQT):
     """
-    Pick a move for the current player using minimax (no pruning).
+    The PieceSquareTables as NumPy arrays indexed by [code + 6, square]
+    (mg and eg) and [code + 6] (phase), for evaluate_encoded.
     """
-    nodes_visited = [0]  
+    mg = np.zeros((13, 64), dtype=np.int64)
+    eg = np.zeros((13, 64), dtype=np.int64)
+    phase = np.zeros(13, dtype=np.int64)
+    for piece, code in BATCH_CODES.items():
+        mg[code + 6] = psqt.mg[piece]
+        eg[code + 6] = psqt.eg[piece]
+        phase[code + 6] = psqt.phase[piece]
+    return mg, eg, phase
 
-    def minimax(board, depth, is_maximizing):
-        nodes_visited[0] += 1
+BATCH_TABLES = build_batch_tables()
+
+def _batch_masks(deltas, slide=False):
+    """uint64 (64,) masks of the squares reached from each square by `deltas` (rays if slide)."""
+    masks = np.zeros(64, dtype=np.uint64)
+    for square in range(64):
+        r, c = divmod(square, 8)
+        mask = 0
+        for dr, dc in deltas:
+            rr, cc = r + dr, c + dc
+            while 0 <= rr < 8 and 0 <= cc < 8:
+                mask |= 1 << (rr * 8 + cc)
+                if not slide:
+                    break
+                rr, cc = rr + dr, cc + dc
+        masks[square] = mask
+    return masks
+
+_KNIGHT_MASKS = _batch_masks([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+_KING_MASKS = _batch_masks([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# Where an enemy pawn attacking a king stands: above a white king (black
+# pawns move down the rows), below a black one
+_PAWN_ATTACKER_MASKS = {1: _batch_masks([(-1, -1), (-1, 1)]), -1: _batch_masks([(1, -1), (1, 1)])}
+# Rays from each square: (is a rook line, masks), towards higher square
+# numbers and towards lower ones
+_RAYS_UP = [(True, _batch_masks([(1, 0)], True)), (True, _batch_masks([(0, 1)], True)),
+            (False, _batch_masks([(1, 1)], True)), (False, _batch_masks([(1, -1)], True))]
+_RAYS_DOWN = [(True, _batch_masks([(-1, 0)], True)), (True, _batch_masks([(0, -1)], True)),
+              (False, _batch_masks([(-1, -1)], True)), (False, _batch_masks([(-1, 1)], True))]
+
+def _bitboards(mask):
+    """uint64 (N,) bitboards, bit s set where mask[:, s] (a bool (N, 64) array) is."""
+    return np.packbits(mask, axis=1, bitorder='little').view('<u8')[:, 0]
+
+def _kings_in_check(chunk, occupied, sign):
+    """
+    bool (N,): is the king of colour `sign` (1 White, -1 Black) attacked in
+    each row of chunk, an int8 (N, 64) encoding whose occupied squares are
+    the bitboards `occupied`.
+    """
+    enemy = -sign
+    king_bb = _bitboards(chunk == 6 * sign)
+    has_king = king_bb != 0
+    # Bit index of the (single) king bit; exact, a power of two converts losslessly
+    king = np.log2(np.where(has_king, king_bb, 1).astype(np.float64)).astype(np.intp)
+    check = (_KNIGHT_MASKS[king] & _bitboards(chunk == 2 * enemy)) != 0
+    check |= (_KING_MASKS[king] & _bitboards(chunk == 6 * enemy)) != 0
+    check |= (_PAWN_ATTACKER_MASKS[sign][king] & _bitboards(chunk == enemy)) != 0
+
+    # Sliders: the first piece along each ray from the king gives check if it
+    # is an enemy rook or queen on a rook line, bishop or queen on a diagonal
+    queens = chunk == 5 * enemy
+    straight = _bitboards(queens | (chunk == 4 * enemy))
+    diagonal = _bitboards(queens | (chunk == 3 * enemy))
+    for rook_line, masks in _RAYS_UP:
+        # Nearest piece up the ray: the lowest set bit
+        blockers = masks[king] & occupied
+        nearest = blockers & (~blockers + np.uint64(1))
+        check |= (nearest & (straight if rook_line else diagonal)) != 0
+    for rook_line, masks in _RAYS_DOWN:
+        # Nearest piece down the ray: the highest set bit, which is a slider
+        # exactly when the slider bits make a larger number than the others
+        blockers = masks[king] & occupied
+        sliders = blockers & (straight if rook_line else diagonal)
+        check |= sliders > (blockers ^ sliders)
+    # A position without this king (e.g. a test setup) is never in check
+    return check & has_king
 
+# evaluate_encoded adds the mg, eg and phase terms in one pass, packed into
+# one int64 per table entry, _PACK_BITS apart: room for 64 squares of up to
+# +-32767 each
+_PACK_BITS = 22
+
+def evaluate_encoded(encoded, tables=None):
+    """
+    evaluate() for every row of an int8 (N, 64) array of encoded positions
+    (see encode_boards), as an int64 (N,) array. Any array-like works,
+    including a np.memmap; it is read BATCH_CHUNK rows at a time.
+
+    The encoding does not record whose move it is, so checkmate and
+    stalemate cannot be recognised: rows for those get the ordinary score
+    (evaluate_batch fills them in from the boards). `tables` defaults to
+    BATCH_TABLES (see build_batch_tables).
+    """
+    mg_table, eg_table, phase_table = BATCH_TABLES if tables is None else tables
+    packed = (mg_table + (eg_table << _PACK_BITS) + (phase_table[:, None] << 2 * _PACK_BITS)).ravel()
+    field, half = (1 << _PACK_BITS) - 1, 1 << (_PACK_BITS - 1)
+    count = len(encoded)
+    scores = np.empty(count, dtype=np.int64)
+    squares = np.arange(64) + 6 * 64
+    for start in range(0, count, BATCH_CHUNK):
+        chunk = np.asarray(encoded[start:start + BATCH_CHUNK], dtype=np.int8)
+        # Material and piece-square terms, tapered by game phase as in evaluate
+        total = packed[chunk.astype(np.intp) * 64 + squares].sum(axis=1)
+        mg = ((total + half) & field) - half
+        total = (total - mg) >> _PACK_BITS
+        eg = ((total + half) & field) - half
+        phase = np.minimum((total - eg) >> _PACK_BITS, PHASE_MAX)
+        score = (mg * phase + eg * (PHASE_MAX - phase)) // PHASE_MAX
+
+        # Check Bonuses/Penalties
+        occupied = _bitboards(chunk != 0)
+        score -= 50 * _kings_in_check(chunk, occupied, 1)
+        score += 50 * _kings_in_check(chunk, occupied, -1)
+        scores[start:start + len(chunk)] = score
+    return scores
+
+def evaluate_batch(boards):
+    """
+    evaluate() for a sequence of boards at once, as an int64 NumPy array;
+    the scores are identical to evaluate(board) for each board. The boards
+    are encoded (encode_boards) and scored with array operations
+    (evaluate_encoded); only checkmate and stalemate are looked up per board.
+    """
+    scores = evaluate_encoded(encode_boards(boards))
+    for i, board in enumerate(boards):
         outcome = board.outcome()
         if outcome:
             if outcome[0] == 'checkmate':
-                if outcome[1] == 'w':
-                    return 10000  
-                else:
-                    return -10000  
+                scores[i] = 1000000 if outcome[1] == 'w' else -1000000
             else:
-                return 0  
-
-        if depth == 0:
-            return evaluate(board)
+                scores[i] = 0
+    return scores
 
-        legal_moves = board.legal_moves()
-        if not legal_moves:
-            return evaluate(board)
+def minimax_value(board, depth, is_maximizing, nodes_visited):
+    """
+    Plain minimax value of board searched to depth (no pruning).
+    nodes_visited is a one-element list that counts the nodes searched.
+    """
+    nodes_visited[0] += 1
 
-        if is_maximizing:
-            max_eval = float('-inf')
-            for move in legal_moves:
-                new_board = board.clone()
-                new_board.make(move)
-                eval_score = minimax(new_board, depth - 1, False)
-                max_eval = max(max_eval, eval_score)
-            return max_eval
+    # Interior nodes need the move list anyway, so generate it first and let
+    # outcome() read off the cached result; leaves only pay for has_legal_move()
+    legal_moves = board.legal_moves() if depth > 0 else None
+    outcome = board.outcome()
+    if outcome:
+        if outcome[0] == 'checkmate':
+            if outcome[1] == 'w':
+                return 10000  
+            else:
+                return -10000  
         else:
-            min_eval = float('inf')
-            for move in legal_moves:
-                new_board = board.clone()
-                new_board.make(move)
-                eval_score = minimax(new_board, depth - 1, True)
-                min_eval = min(min_eval, eval_score)
-            return min_eval
+            return 0  
+
+    if depth == 0:
+        return evaluate(board)
+
+    if is_maximizing:
+        max_eval = float('-inf')
+        for move in legal_moves:
+            board.make(move)
+            eval_score = minimax_value(board, depth - 1, False, nodes_visited)
+            board.unmake()
+            max_eval = max(max_eval, eval_score)
+        return max_eval
+    else:
+        min_eval = float('inf')
+        for move in legal_moves:
+            board.make(move)
+            eval_score = minimax_value(board, depth - 1, True, nodes_visited)
+            board.unmake()
+            min_eval = min(min_eval, eval_score)
+        return min_eval
+
+def choose_minimax_move(board, depth=2, metrics=None, workers=1):
+    """
+    Pick a move for the current player using minimax (no pruning).
 
+    With workers > 1 the root moves are searched in parallel by a process
+    pool (see rootsplit.py); the result and node count are the same.
+    If `metrics` is a dict, the node count is written into it.
+    """
+    if workers > 1:
+        from .rootsplit import parallel_minimax
+        best_move, nodes = parallel_minimax(board, depth, workers)
+        if metrics is not None:
+            metrics['nodes'] = nodes
+        return best_move, nodes
+
+    nodes_visited = [0]  
+
+    # Search on a private copy: children are made and unmade in place
+    board = prepare_board(board.clone())
     is_maximizing = (board.turn == 'w')
     legal_moves = board.legal_moves()
 
@@ -244,9 +767,9 @@ def choose_minimax_move(board, depth=2, metrics=None):
     best_value = float('-inf') if is_maximizing else float('inf')
 
     for move in legal_moves:
-        new_board = board.clone()
-        new_board.make(move)
-        move_value = minimax(new_board, depth - 1, not is_maximizing)
+        board.make(move)
+        move_value = minimax_value(board, depth - 1, not is_maximizing, nodes_visited)
+        board.unmake()
 
         if is_maximizing:
             if move_value > best_value:
@@ -257,34 +780,150 @@ def choose_minimax_move(board, depth=2, metrics=None):
                 best_value = move_value
                 best_move = move
 
+    if metrics is not None:
+        metrics['nodes'] = nodes_visited[0]
     return best_move, nodes_visited[0]
 
-def choose_alphabeta_move(board, depth=3, metrics=None):
+def is_winning_capture(board, move):
+    """
+    True for promotions and captures that win material or trade evenly
+    (the victim is worth at least the attacker), so they are searched
+    before the killers. King captures can never be recaptured.
+    """
+    start, end, promote = move
+    if promote:
+        return True
+    attacker = board.piece_at(start[0], start[1])[1]
+    victim = board.piece_at(end[0], end[1])
+    return attacker == 'K' or PIECE_VALUES[victim[1]] >= PIECE_VALUES[attacker]
+
+def pick_moves(board, hash_move=0, killers=(), countermove=0, history=None):
+    """
+    Staged move picker for alpha-beta nodes.
+
+    Yields the legal moves of `board` in this order:
+      1. the hash move (an encode_move code from the TT),
+      2. winning and even captures and promotions, by MVV-LVA,
+      3. the killer moves of this ply (quiet moves that cut off before),
+      4. the countermove to the opponent's last move,
+      5. the remaining captures (without an exchange evaluator many of
+         these still win, so they come before the quiet moves),
+      6. the remaining quiet moves, highest history score first (`history`
+         is the Engine's butterfly table; without it, generation order).
+
+    Each stage is only generated once the previous one has been searched
+    without a cutoff, so a node that fails high on the hash move or a good
+    capture never generates its quiet moves at all. The hash move and the
+    killers are checked with board.is_legal() instead of by generation.
+    The caller must unmake its move before asking for the next one.
+    """
+    tried = []
+    if hash_move:
+        move = decode_move(hash_move)
+        if board.is_legal(move):
+            tried.append(hash_move)
+            yield move
+
+    captures = board.legal_captures()
+    losing = []
+    for move in captures:
+        if encode_move(move) in tried:
+            continue
+        if is_winning_capture(board, move):
+            yield move
+        else:
+            losing.append(move)
+
+    for code in (*killers, countermove):
+        if code and code not in tried:
+            move = decode_move(code)
+            # Killers and countermoves are quiet; one that is now a capture was searched above
+            if not move.promote and board.piece_at(*move.dst) is None and board.is_legal(move):
+                tried.append(code)
+                yield move
+
+    yield from losing
+    quiets = board.legal_quiets()
+    if history is not None:
+        base = 0 if board.turn == 'w' else 4096
+        # Stable sort: quiet moves without history keep generation order
+        quiets.sort(key=lambda m: history[base + (encode_move(m) & 4095)], reverse=True)
+    for move in quiets:
+        if not tried or encode_move(move) not in tried:
+            yield move
+
+def choose_alphabeta_move(board, depth=3, metrics=None, engine=None, window=None, forward_pruning=False):
     """
     Pick a move for the current player using minimax with alpha-beta pruning.
+    Search state (TT, killers) comes from `engine`, the module's ENGINE by default.
+    The state is kept between calls, so a repeated search is quicker: the root
+    is always searched, but deeper nodes may be answered by the TT. Call
+    engine.reset() first for cold node counts.
+
+    The search is a principal variation search: the first move at each node
+    gets the full (alpha, beta) window and every later move a null-window
+    scout that only proves it is no better; a scout that fails the other
+    way is re-searched with the full window. `window` is the (alpha, beta)
+    root window (full by default); the root value ends up in engine.score,
+    and a value outside the window is only a bound.
+
+    With `forward_pruning` the engine's forward pruning switches (null move, late
+    move reductions, futility) apply; choose_move searches that way. Without
+    it the search is exact and agrees with choose_minimax_move.
+
+    If `metrics` is a dict, the search's counters are written into it: nodes,
+    qnodes, tt_probes/tt_hits, cutoffs (beta cutoffs), first_move_cutoffs
+    (cutoffs by the first move searched, a measure of move ordering) and
+    quiet_cutoffs (those that update the killer/history/countermove tables),
+    tb_hits (positions scored by the endgame tablebases, see tablebases()), plus
+    the time spent generating moves and evaluating (movegen_ms, eval_ms).
+    The timers are only swapped in when metrics is given, so without it the
+    search pays for nothing but the counters it needs anyway.
 
     Returns:
         (best_move, nodes_visited)
     """
     nodes_visited = [0]
-    
-    # Flags for Transposition Table
-    EXACT = 0
-    LOWERBOUND = 1
-    UPPERBOUND = 2
-
-    def score_move(board, move):
-        # Quick heuristic for move ordering
-        start, end, promote = move
-        victim = board.piece_at(end[0], end[1])
-        attacker = board.piece_at(start[0], start[1])
-        score = 0
-        if victim:
-            # MVV-LVA: Most Valuable Victim - Least Valuable Attacker
-            score = 100 * PIECE_VALUES.get(victim[1], 0) - PIECE_VALUES.get(attacker[1], 0)
-        if promote == 'Q':
-            score += 900
-        return score
+    qnodes = [0]
+    # [beta cutoffs, of which by the first move, of which by a quiet move]
+    cutoffs = [0, 0, 0]
+    # [null-move cutoffs, reduced moves, reduced moves re-searched, futility-pruned moves]
+    pruning = [0, 0, 0, 0]
+    if engine is None:
+        engine = ENGINE
+    engine.start_search(board)
+    tt = engine.tt
+    killers = engine.killers
+    history = engine.history
+    countermoves = engine.countermoves
+    if forward_pruning:
+        null_move, lmr, futility = engine.null_move, engine.lmr, engine.futility
+    else:
+        null_move = lmr = futility = False
+    if engine.tt_pruned is not None and engine.tt_pruned != bool(forward_pruning):
+        # Bounds from a pruned search are not exact ones (nor the other way round)
+        tt.clear()
+    engine.tt_pruned = bool(forward_pruning)
+    stop = engine.stop
+    stop_poll = [STOP_POLL_NODES]
+    # Endgames small enough for the tablebases get exact scores below the root
+    tb = tablebases()
+    if tb and board.piece_count() > max(tb.max_pieces, TB_PROBE_PIECES):
+        tb = None
+    tb_hits = [0]
+
+    # Search primitives; the profiled versions time themselves into `timings`
+    if metrics is not None:
+        timings = {'movegen_ms': 0.0, 'eval_ms': 0.0}
+        evaluate_fn = timed(evaluate, timings, 'eval_ms')
+        captures_fn = timed(methodcaller('legal_captures'), timings, 'movegen_ms')
+        outcome_fn = timed(methodcaller('outcome'), timings, 'movegen_ms')
+        pick_fn = timed_iter(pick_moves, timings, 'movegen_ms')
+    else:
+        evaluate_fn = evaluate
+        captures_fn = methodcaller('legal_captures')
+        outcome_fn = methodcaller('outcome')
+        pick_fn = pick_moves
 
     def quiescence(board, alpha, beta, is_maximizing):
         """
@@ -292,7 +931,8 @@ def choose_alphabeta_move(board, depth=3, metrics=None):
         Only considers captures and promotions.
         """
         nodes_visited[0] += 1
-        stand_pat = evaluate(board)
+        qnodes[0] += 1
+        stand_pat = evaluate_fn(board)
         
         # Fail-hard beta cutoff
         if is_maximizing:
@@ -306,28 +946,18 @@ def choose_alphabeta_move(board, depth=3, metrics=None):
             if stand_pat < beta:
                 beta = stand_pat
 
-        # Get all legal moves
-        legal_moves = board.legal_moves()
-        
-        # Filter for "Loud" moves: Captures or Promotions
-        loud_moves = []
-        for move in legal_moves:
-            dst_r, dst_c = move.dst
-            # Check if there is a piece at destination (Capture) OR if it is a promotion
-            if board.piece_at(dst_r, dst_c) is not None or move.promote is not None:
-                loud_moves.append(move)
+        # Only "Loud" moves: Captures or Promotions, generated directly and
+        # already ordered by MVV-LVA (quiet moves are never generated here)
+        loud_moves = captures_fn(board)
 
         if not loud_moves:
             return stand_pat
 
-        # Order captures by MVV-LVA
-        loud_moves.sort(key=lambda m: score_move(board, m), reverse=True)
-
         if is_maximizing:
             for move in loud_moves:
-                new_board = board.clone()
-                new_board.make(move)
-                score = quiescence(new_board, alpha, beta, False)
+                board.make(move)
+                score = quiescence(board, alpha, beta, False)
+                board.unmake()
                 
                 if score >= beta:
                     return beta
@@ -336,9 +966,9 @@ def choose_alphabeta_move(board, depth=3, metrics=None):
             return alpha
         else:
             for move in loud_moves:
-                new_board = board.clone()
-                new_board.make(move)
-                score = quiescence(new_board, alpha, beta, True)
+                board.make(move)
+                score = quiescence(board, alpha, beta, True)
+                board.unmake()
                 
                 if score <= alpha:
                     return alpha
@@ -348,29 +978,50 @@ def choose_alphabeta_move(board, depth=3, metrics=None):
 
     def alphabeta(board, current_depth, alpha, beta, is_maximizing):
         nodes_visited[0] += 1
+
+        # Cooperative stop, e.g. when another process of a parallel search is done
+        if stop is not None:
+            stop_poll[0] -= 1
+            if stop_poll[0] <= 0:
+                stop_poll[0] = STOP_POLL_NODES
+                if stop.value:
+                    raise SearchStopped()
         
         # Transposition Table Lookup
-        # Create a hashable tuple representation of the board + turn
-        board_key = (
-            tuple(tuple(row) for row in board.board),
-            board.turn
-        )
+        # The incremental Zobrist key covers the pieces and the side to move
+        board_key = board.zobrist
+        # Window on entry, used to classify the stored bound
+        alpha_orig, beta_orig = alpha, beta
         
-        tt_entry = TRANSPOSITION_TABLE.get(board_key)
+        tt_entry = tt.probe(board_key)
         
-        if tt_entry and tt_entry[0] >= current_depth:
+        # No cutoff at the root: the TT survives between calls, and a repeated
+        # search must still search (there the entry only orders the moves)
+        if tt_entry and tt_entry[0] >= current_depth and current_depth < depth:
             tt_depth, tt_value, tt_flag, tt_move = tt_entry
             if tt_flag == EXACT:
-                return tt_value, tt_move
+                return tt_value, decode_move(tt_move)
             elif tt_flag == LOWERBOUND:
                 alpha = max(alpha, tt_value)
             elif tt_flag == UPPERBOUND:
                 beta = min(beta, tt_value)
             
             if alpha >= beta:
-                return tt_value, tt_move
+                return tt_value, decode_move(tt_move)
 
-        outcome = board.outcome()
+        if tb and current_depth < depth and board.piece_count() <= tb.max_pieces:
+            found = tb.probe(board)
+            if found is not None:
+                tb_hits[0] += 1
+                result, plies = found
+                if not result:
+                    return 0, None
+                # Like checkmate scores: the sooner the mate, the higher
+                score = TB_WIN + current_depth - plies
+                return (score if (result > 0) == (board.turn == 'w') else -score), None
+
+        # Moves are generated lazily below, so only ask whether any exist
+        outcome = outcome_fn(board)
         if outcome:
             if outcome[0] == 'checkmate':
                 # Prefer shorter mates
@@ -382,86 +1033,296 @@ def choose_alphabeta_move(board, depth=3, metrics=None):
             # Drop into Quiescence Search instead of raw evaluate
             return quiescence(board, alpha, beta, is_maximizing), None
 
-        # Move Ordering
-        legal_moves = board.legal_moves()
-        if not legal_moves:
-            return evaluate(board), None
+        ply = min(depth - current_depth, MAX_PLY - 1)
+        in_check = board.in_check()
 
-        # Try the TT move first (pv_move), then captures, then rest
-        pv_move = None
+        # Null-move pruning: if passing still fails high, a real move will too.
+        # Only in null-window nodes below the root, not twice in a row, not in
+        # check, and not with only pawns left (where passing may be the best
+        # move: zugzwang).
+        if (null_move and ply and beta - alpha == 1 and current_depth > NULL_MOVE_R and not in_check
+                and abs(beta) < MATE_BOUND and board.history[-1][0] is not None
+                and board.has_non_pawn_material(board.turn)):
+            board.make_null()
+            if is_maximizing:
+                null_val, _ = alphabeta(board, current_depth - 1 - NULL_MOVE_R, alpha, beta, False)
+            else:
+                null_val, _ = alphabeta(board, current_depth - 1 - NULL_MOVE_R, alpha, beta, True)
+            board.unmake_null()
+            if (null_val >= beta) if is_maximizing else (null_val <= alpha):
+                pruning[0] += 1
+                return (beta if is_maximizing else alpha), None
+
+        # Futility pruning at frontier nodes: quiet moves cannot lift a lost cause
+        futile = False
+        if futility and ply and current_depth == 1 and not in_check:
+            static = evaluate_fn(board)
+            if is_maximizing:
+                futile = static + FUTILITY_MARGIN <= alpha
+                futility_value = static + FUTILITY_MARGIN
+            else:
+                futile = static - FUTILITY_MARGIN >= beta
+                futility_value = static - FUTILITY_MARGIN
+        may_reduce = lmr and current_depth >= LMR_MIN_DEPTH and not in_check
+
+        # Move Ordering
+        # Staged: TT move (pv_move), good captures, killers, countermove, losing captures, history-sorted quiets
+        pv_move = 0
         if tt_entry:
             pv_move = tt_entry[3]
-            
-        def move_sorter(m):
-            if m == pv_move: return 1000000
-            return score_move(board, m)
-            
-        sorted_moves = sorted(legal_moves, key=move_sorter, reverse=True)
+        ply_killers = killers[ply]
+        # The opponent's last move (None after a null move) selects the countermove slot
+        last = board.history[-1][0] if board.history else None
+        counter_index = encode_move(last) & 4095 if last else -1
+        countermove = countermoves[counter_index] if last else 0
 
         best_move_in_node = None
-        if is_maximizing:
-            value = float('-inf')
-            for move in sorted_moves:
-                new_board = board.clone()
-                new_board.make(move)
-                new_val, _ = alphabeta(new_board, current_depth - 1, alpha, beta, False)
-                
+        cutoff = False
+        searched = 0
+        tried_moves = []
+        value = float('-inf') if is_maximizing else float('inf')
+        for move in pick_fn(board, pv_move, ply_killers, countermove, history):
+            searched += 1
+            tried_moves.append(move)
+            reduction = 0
+            if futile or (may_reduce and searched > LMR_FULL_MOVES):
+                quiet = not move.promote and board.piece_at(*move.dst) is None
+                board.make(move)
+                if quiet and not board.in_check():
+                    if futile:
+                        board.unmake()
+                        pruning[3] += 1
+                        # The move is worth no more than the futility bound
+                        if (futility_value > value) if is_maximizing else (futility_value < value):
+                            value = futility_value
+                        continue
+                    # Late move reduction: one ply less, two for the very late moves
+                    reduction = 1 if searched <= 2 * LMR_FULL_MOVES or current_depth < 5 else 2
+            else:
+                board.make(move)
+
+            if searched == 1:
+                new_val, _ = alphabeta(board, current_depth - 1, alpha, beta, not is_maximizing)
+            else:
+                # PVS: scout with a null window (at reduced depth for a late quiet
+                # move), and search again only if the move proves better
+                scout = (alpha, alpha + 1) if is_maximizing else (beta - 1, beta)
+                better = True
+                if reduction:
+                    pruning[1] += 1
+                    new_val, _ = alphabeta(board, current_depth - 1 - reduction, *scout, not is_maximizing)
+                    better = (new_val > alpha) if is_maximizing else (new_val < beta)
+                    if better:
+                        pruning[2] += 1
+                if better:
+                    new_val, _ = alphabeta(board, current_depth - 1, *scout, not is_maximizing)
+                    if alpha < new_val < beta:
+                        new_val, _ = alphabeta(board, current_depth - 1, alpha, beta, not is_maximizing)
+            board.unmake()
+
+            if is_maximizing:
                 if new_val > value:
                     value = new_val
                     best_move_in_node = move
-                
                 alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-        else:
-            value = float('inf')
-            for move in sorted_moves:
-                new_board = board.clone()
-                new_board.make(move)
-                new_val, _ = alphabeta(new_board, current_depth - 1, alpha, beta, True)
-                
+            else:
                 if new_val < value:
                     value = new_val
                     best_move_in_node = move
-                    
                 beta = min(beta, value)
-                if beta <= alpha:
-                    break
+            if alpha >= beta:
+                cutoff = True
+                break
+
+        if cutoff:
+            cutoffs[0] += 1
+            if searched == 1:
+                cutoffs[1] += 1
+
+        # Remember quiet moves that caused a cutoff: killers for this ply,
+        # the history score, and the reply to the opponent's last move
+        if cutoff and not best_move_in_node.promote and board.piece_at(*best_move_in_node.dst) is None:
+            code = encode_move(best_move_in_node)
+            if code != ply_killers[0]:
+                ply_killers[1] = ply_killers[0]
+                ply_killers[0] = code
+            slot = (0 if is_maximizing else 4096) + (code & 4095)
+            bonus = current_depth * current_depth
+            history[slot] += bonus
+            # The quiet moves searched before it did not cut off: lower their scores
+            for earlier in tried_moves[:-1]:
+                if not earlier.promote and board.piece_at(*earlier.dst) is None:
+                    history[(slot & 4096) + (encode_move(earlier) & 4095)] -= bonus
+            if history[slot] > HISTORY_MAX:
+                history[:] = [h >> 1 for h in history]
+            if last:
+                countermoves[counter_index] = code
+            cutoffs[2] += 1
 
         # Store in Transposition Table
         flag = EXACT
-        if value <= alpha: flag = UPPERBOUND
-        elif value >= beta: flag = LOWERBOUND
+        if value <= alpha_orig: flag = UPPERBOUND
+        elif value >= beta_orig: flag = LOWERBOUND
         
-        TRANSPOSITION_TABLE[board_key] = (current_depth, value, flag, best_move_in_node)
+        tt.store(board_key, current_depth, value, flag, encode_move(best_move_in_node))
         
         return value, best_move_in_node
 
-    # Start the search from the root
-    alpha = float('-inf')
-    beta = float('inf')
+    # Start the search from the root, on a private copy that is made/unmade in place
+    board = prepare_board(board.clone())
+    alpha, beta = window if window else (float('-inf'), float('inf'))
     is_max = (board.turn == 'w')
+    probes, hits = tt.probes, tt.hits
     
     best_val, best_move = alphabeta(board, depth, alpha, beta, is_max)
+    engine.score = best_val
+
+    if metrics is not None:
+        metrics['nodes'] = nodes_visited[0]
+        metrics['qnodes'] = qnodes[0]
+        metrics['tt_probes'] = tt.probes - probes
+        metrics['tt_hits'] = tt.hits - hits
+        metrics['cutoffs'] = cutoffs[0]
+        metrics['first_move_cutoffs'] = cutoffs[1]
+        metrics['first_move_cutoff_rate'] = cutoffs[1] / cutoffs[0] if cutoffs[0] else 0.0
+        metrics['quiet_cutoffs'] = cutoffs[2]
+        metrics['null_cutoffs'] = pruning[0]
+        metrics['reductions'] = pruning[1]
+        metrics['lmr_researches'] = pruning[2]
+        metrics['futility_pruned'] = pruning[3]
+        metrics['tb_hits'] = tb_hits[0]
+        metrics.update(timings)
     
     return best_move, nodes_visited[0]
 
-def choose_move(board):
+# Counters choose_move adds up over its iterations
+SUMMED_METRICS = ('nodes', 'qnodes', 'tt_probes', 'tt_hits', 'cutoffs', 'first_move_cutoffs',
+                  'quiet_cutoffs', 'null_cutoffs', 'reductions', 'lmr_researches', 'futility_pruned',
+                  'tb_hits', 'movegen_ms', 'eval_ms')
+
+# Aspiration windows: half-width around the previous iteration's score (centipawns; the
+# eval's 50 point check term makes narrower windows fail often),
+# the first depth that uses one, and the half-width past which the window opens fully
+ASPIRATION_DELTA = 100
+ASPIRATION_MIN_DEPTH = 3
+ASPIRATION_MAX_DELTA = 800
+
+def add_metrics(total, part):
+    """Add the counters of one search (`part`) into `total`."""
+    for key in SUMMED_METRICS:
+        total[key] = total.get(key, 0) + part.get(key, 0)
+
+def aspiration_search(board, depth, score, metrics=None, engine=None):
+    """
+    choose_alphabeta_move to `depth` with an aspiration window around
+    `score`, the previous iteration's root value (None for a full window).
+
+    A narrow window cuts off more, but when the value falls outside it the
+    result is only a bound, so that side of the window is widened (4x each
+    time, then fully open) and the depth searched again. Returns
+    (best_move, nodes) over all attempts; metrics also gets `researches`.
+    """
+    if engine is None:
+        engine = ENGINE
+    if score is None or depth < ASPIRATION_MIN_DEPTH or abs(score) >= MATE_BOUND:
+        return choose_alphabeta_move(board, depth, metrics, engine, forward_pruning=True)
+
+    low = high = ASPIRATION_DELTA
+    nodes = 0
+    researches = 0
+    while True:
+        alpha = score - low if low <= ASPIRATION_MAX_DELTA else float('-inf')
+        beta = score + high if high <= ASPIRATION_MAX_DELTA else float('inf')
+        part = {} if metrics is not None else None
+        best_move, n = choose_alphabeta_move(board, depth, part, engine, window=(alpha, beta), forward_pruning=True)
+        nodes += n
+        if metrics is not None:
+            add_metrics(metrics, part)
+        value = engine.score
+        if value <= alpha and alpha != float('-inf'):
+            low *= 4
+        elif value >= beta and beta != float('inf'):
+            high *= 4
+        else:
+            break
+        researches += 1
+    if metrics is not None:
+        metrics['researches'] = researches
+    return best_move, nodes
+
+def choose_move(board, max_depth=49, metrics=None):
     """
     Pick a move using iterative deepening search (IDS).
+
+    The TT is not cleared between moves: the shallow iterations after the
+    opponent's reply mostly hit entries from our previous search. From depth
+    ASPIRATION_MIN_DEPTH on, each iteration searches an aspiration window
+    around the previous iteration's score (see aspiration_search). Positions
+    in the opening book are not searched at all, nor are won or lost
+    positions in the endgame tablebases.
+    `max_depth` and `metrics` are optional: with a metrics dict the counters
+    of every completed iteration are added up in it (see
+    choose_alphabeta_move), `depth` is the last completed depth and
+    `metrics['iterations']` keeps each iteration's own counters. A Lazy SMP
+    search (SEARCH_WORKERS > 1) records only depth and nodes.
     """
-    global TRANSPOSITION_TABLE
-    TRANSPOSITION_TABLE.clear()
-    
+    global _SMP
     legal_moves = board.legal_moves()
     if not legal_moves:
         return
 
+    # Book positions are answered at once, leaving the time for later moves
+    move = book_move(board)
+    if move is not None:
+        if metrics is not None:
+            metrics['book'] = True
+        yield move
+        return
+
+    # Won and lost tablebase positions are played straight from the table:
+    # the quickest mate, or the longest defence
+    tb = tablebases()
+    if tb and board.piece_count() <= tb.max_pieces:
+        found = tb.best_move(board.clone())
+        if found is not None and found[1] != 0:
+            move, result, plies = found
+            if metrics is not None:
+                metrics['tablebase'] = True
+                metrics['dtm'] = plies if result > 0 else -plies
+            yield move
+            return
+
     yield legal_moves[0]
+
+    if SEARCH_WORKERS > 1:
+        # Helper processes start once and are reused for every move
+        if _SMP is None:
+            from .smp import LazySMP
+            _SMP = LazySMP(SEARCH_WORKERS, TT_SIZE_MB)
+        for depth, best_move, nodes in _SMP.search(board, max_depth):
+            if metrics is not None:
+                # Main-process nodes; a helper may finish more than one depth at once
+                metrics.setdefault('iterations', []).append({'depth': depth, 'nodes': nodes - metrics.get('nodes', 0)})
+                metrics['nodes'] = nodes
+                metrics['depth'] = depth
+            yield best_move
+        if metrics is not None:
+            # The helpers' nodes are added in once the search has ended
+            metrics['nodes'] = _SMP.nodes
+        return
     
-    for depth in range(1, 50):
+    # Each iteration's window is centred on the score of the one before
+    score = None
+    for depth in range(1, max_depth + 1):
         try:
-            best_move, nodes = choose_alphabeta_move(board, depth=depth)
+            iteration = {} if metrics is not None else None
+            best_move, nodes = aspiration_search(board, depth, score, iteration)
+            score = ENGINE.score
+            if metrics is not None:
+                metrics.setdefault('iterations', []).append(iteration)
+                add_metrics(metrics, iteration)
+                metrics['researches'] = metrics.get('researches', 0) + iteration.get('researches', 0)
+                metrics['depth'] = depth
             
             if best_move:
                 yield best_move
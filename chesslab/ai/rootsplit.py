@@ -0,0 +1,67 @@
+"""
+Process-parallel minimax: choose_minimax_move with its root subtrees searched
+by separate processes (see chesslab/rootsplit.py for how the root is split).
+
+    move, nodes = parallel_minimax(board, depth=4, workers=8)
+"""
+
+from __future__ import annotations
+
+from ..rootsplit import split_paths, run_split
+
+# Aim for at least this many tasks per process so uneven subtrees even out
+TASKS_PER_WORKER = 4
+
+
+def _minimax_task(board, plies, depth):
+    # Always the repo's chesslab.ai.ai: a module loaded from a file path cannot be imported by the pool
+    from . import ai
+    ai.prepare_board(board)
+    nodes_visited = [0]
+    value = ai.minimax_value(board, depth - plies, board.turn == 'w', nodes_visited)
+    return value, nodes_visited[0]
+
+
+def parallel_minimax(board, depth, workers):
+    """
+    choose_minimax_move with the root split across `workers` processes.
+    Returns (best_move, nodes_visited), identical to the sequential search:
+    ties go to the first root move in legal_moves() order.
+    """
+    board = board.clone()
+    is_maximizing = (board.turn == 'w')
+    paths = split_paths(board, depth, workers * TASKS_PER_WORKER)
+    if not paths:
+        return None, 0
+    results = run_split(board, paths, _minimax_task, (depth,), workers)
+
+    # Fold (move, reply) results back into one value per root move
+    root = {}
+    nodes = 0
+    for path, (value, n) in zip(paths, results):
+        nodes += n
+        move = path[0]
+        key = tuple(move)
+        if key not in root:
+            root[key] = [move, value]
+            if len(path) > 1:
+                # The root move's own node, counted once as the sequential search does
+                nodes += 1
+        elif is_maximizing:
+            # The reply is the opponent's choice
+            root[key][1] = min(root[key][1], value)
+        else:
+            root[key][1] = max(root[key][1], value)
+
+    best_move = None
+    best_value = float('-inf') if is_maximizing else float('inf')
+    for move, value in root.values():
+        if is_maximizing:
+            if value > best_value:
+                best_value = value
+                best_move = move
+        else:
+            if value < best_value:
+                best_value = value
+                best_move = move
+    return best_move, nodes
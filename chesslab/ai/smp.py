@@ -0,0 +1,277 @@
+"""
+Lazy SMP: parallel iterative deepening over a shared transposition table.
+
+LazySMP starts `workers - 1` helper processes that stay alive between moves.
+For each search every helper runs the same iterative-deepening alpha-beta on
+the root position as the main process does. Odd-numbered helpers run one ply
+ahead, and each helper has its own killer tables, so the helpers drift into
+different parts of the tree.
+
+They share nothing but one TranspositionTable placed in
+multiprocessing.shared_memory. The table needs no locks: each entry stores
+`key ^ data`, so an entry torn by two processes writing at once just fails
+the check on probe. Whatever one process learns cuts off the others' search.
+The main process reports the deepest iteration completed by any process.
+
+    smp = LazySMP(workers=4)
+    for depth, move, nodes in smp.search(board, max_depth=6):
+        ...
+    smp.close()
+
+time_to_depth_report() measures the speedup per core count.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from multiprocessing.util import Finalize
+
+from ..board import Board
+from ..worker import GRACE, game_record, replay_game
+from .ai import Engine, SearchStopped, TT_SIZE_MB, choose_alphabeta_move
+from .tt import TranspositionTable, encode_move, decode_move
+
+MAX_DEPTH = 50
+# At the deadline the helpers are only given this long to stop, well inside
+# the harness's grace period; one still busy is waited for (up to
+# SETTLE_TIMEOUT, then replaced) when the next search starts
+STOP_TIMEOUT = GRACE / 5
+SETTLE_TIMEOUT = 2.0
+
+# Default positions for time_to_depth_report: opening, two middlegames, an endgame
+REPORT_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w",
+    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w",
+]
+
+
+class _HelperStop:
+    """Stop flag for a helper: the shared flag, or the parent process having gone away."""
+
+    def __init__(self, flag):
+        self.flag = flag
+        self.parent = os.getppid()
+
+    @property
+    def value(self):
+        return self.flag.value or os.getppid() != self.parent
+
+
+def _helper(index, shm_name, tt_size_mb, flag, conn):
+    """Helper process: attach to the shared table and search whatever root it is sent."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    tt = TranspositionTable(tt_size_mb, buffer=shm.buf)
+    engine = Engine(tt=tt, stop=_HelperStop(flag))
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                return
+            if msg[0] == 'quit':
+                return
+            _, (fen, moves), backend, max_depth, generation = msg
+            # The whole game, so the helper's board has the caller's move history
+            board = replay_game(fen, moves, backend)
+            # Same root and generation as the main process, so start_search ages nothing
+            engine.root_key = board.zobrist
+            tt.generation = generation
+            nodes = 0
+            try:
+                for depth in range(1 + (index & 1), max_depth + 1):
+                    move, n = choose_alphabeta_move(board, depth, engine=engine, forward_pruning=True)
+                    nodes += n
+                    conn.send(('depth', depth, encode_move(move), nodes))
+            except SearchStopped:
+                pass
+            conn.send(('idle', nodes))
+    finally:
+        tt.release()
+        shm.close()
+
+
+class _MainStop:
+    """Stop flag for the main process: stop an iteration a helper has already completed."""
+
+    def __init__(self, smp):
+        self.smp = smp
+
+    @property
+    def value(self):
+        return self.smp._overtaken()
+
+
+class LazySMP:
+    """
+    A pool of `workers - 1` helper processes plus the calling process,
+    sharing one `tt_size_mb` transposition table. Call close() when done.
+    """
+
+    def __init__(self, workers=2, tt_size_mb=TT_SIZE_MB):
+        self.workers = max(1, workers)
+        self.tt_size_mb = tt_size_mb
+        self.shm = shared_memory.SharedMemory(create=True, size=TranspositionTable.nbytes(tt_size_mb))
+        self.tt = TranspositionTable(tt_size_mb, buffer=self.shm.buf)
+        self.tt.clear()
+        self.flag = multiprocessing.Value('b', 0, lock=False)
+        self.engine = Engine(tt=self.tt, stop=_MainStop(self))
+        self.helpers = [None] * (self.workers - 1)
+        self.best = None
+        self.target = 0
+        self.nodes = 0
+        # Also runs when a worker process exits, where atexit handlers do not
+        Finalize(self, self.close, exitpriority=10)
+
+    def _spawn(self, i):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_helper,
+            args=(i + 1, self.shm.name, self.tt_size_mb, self.flag, child_conn),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self.helpers[i] = [process, parent_conn, False]
+
+    def _drain(self, timeout=0.0):
+        """Read helper reports; returns the connections that went idle."""
+        busy = {h[1]: h for h in self.helpers if h and h[2]}
+        idle = []
+        for conn in wait(list(busy), timeout):
+            helper = busy[conn]
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                helper[2] = False
+                idle.append(conn)
+                continue
+            if msg[0] == 'depth':
+                _, depth, code, nodes = msg
+                if code and (self.best is None or depth > self.best[0]):
+                    self.best = (depth, code)
+            else:
+                helper[2] = False
+                self.nodes += msg[1]
+                idle.append(conn)
+        return idle
+
+    def _overtaken(self):
+        """Has a helper already finished the depth the main process is searching?"""
+        if any(h and h[2] for h in self.helpers):
+            self._drain()
+        return self.best is not None and self.best[0] >= self.target
+
+    def search(self, board, max_depth=MAX_DEPTH):
+        """
+        Search board with all workers; yields (depth, move, nodes) each time the
+        deepest completed iteration improves. nodes counts the main process only
+        until the search ends, when the helpers report their totals to self.nodes.
+        """
+        self._settle()
+        self.engine.start_search(board)
+        self.best = None
+        self.nodes = 0
+        record = game_record(board)
+        for i, helper in enumerate(self.helpers):
+            if helper is None or not helper[0].is_alive():
+                self._spawn(i)
+            helper = self.helpers[i]
+            helper[1].send(('go', record, board.backend, max_depth, self.tt.generation))
+            helper[2] = True
+        reported = 0
+        try:
+            for depth in range(1, max_depth + 1):
+                if self.best is not None and self.best[0] >= depth:
+                    continue
+                self.target = depth
+                try:
+                    move, n = choose_alphabeta_move(board, depth, engine=self.engine, forward_pruning=True)
+                    self.nodes += n
+                    if move is not None and (self.best is None or depth > self.best[0]):
+                        self.best = (depth, encode_move(move))
+                except SearchStopped:
+                    pass
+                self._drain()
+                if self.best is not None and self.best[0] > reported:
+                    reported = self.best[0]
+                    yield reported, decode_move(self.best[1]), self.nodes
+        finally:
+            self._stop_helpers()
+
+    def _wait_idle(self, timeout):
+        deadline = time.time() + timeout
+        while any(h and h[2] for h in self.helpers) and time.time() < deadline:
+            self._drain(max(0.0, deadline - time.time()))
+
+    def _stop_helpers(self):
+        """Tell the helpers to stop; waits at most STOP_TIMEOUT and kills nothing."""
+        self.flag.value = 1
+        self._wait_idle(STOP_TIMEOUT)
+        if not any(h and h[2] for h in self.helpers):
+            self.flag.value = 0
+
+    def _settle(self):
+        """Before a search: wait for helpers still stopping from the last one, replacing any that hang."""
+        if any(h and h[2] for h in self.helpers):
+            self.flag.value = 1
+            self._wait_idle(SETTLE_TIMEOUT)
+            for i, helper in enumerate(self.helpers):
+                if helper and helper[2]:
+                    helper[0].kill()
+                    helper[0].join()
+                    self.helpers[i] = None
+        self.flag.value = 0
+
+    def close(self):
+        if self.shm is None:
+            return
+        for helper in self.helpers:
+            if helper:
+                try:
+                    helper[1].send(('quit',))
+                except OSError:
+                    pass
+                helper[0].join(timeout=SETTLE_TIMEOUT)
+                if helper[0].is_alive():
+                    helper[0].kill()
+        self.helpers = []
+        self.tt.release()
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+
+def time_to_depth_report(fens=REPORT_FENS, depth=4, worker_counts=(1, 2, 4), tt_size_mb=TT_SIZE_MB, out=print):
+    """
+    Time each position's search to `depth` for every worker count, starting
+    from an empty table each time, and report total wall time and speedup
+    over the first count. Returns {workers: seconds}.
+    """
+    times = {}
+    for workers in worker_counts:
+        smp = LazySMP(workers, tt_size_mb)
+        total = 0.0
+        try:
+            for fen in fens:
+                smp.tt.clear()
+                board = Board.from_fen(fen)
+                start = time.perf_counter()
+                for reached, move, nodes in smp.search(board, max_depth=depth):
+                    if reached >= depth:
+                        break
+                total += time.perf_counter() - start
+        finally:
+            smp.close()
+        times[workers] = total
+    base = times[worker_counts[0]]
+    out(f"Time to depth {depth} over {len(fens)} positions")
+    out(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers, seconds in times.items():
+        out(f"{workers:>8} {seconds:>9.2f} {base / seconds if seconds else 0.0:>8.2f}")
+    return times
@@ -0,0 +1,11 @@
+"""
+Fixed-size transposition table for the ChessLab search.
+
+The table is defined in ai.py, which is submitted on its own and so cannot
+import it from here; this module re-exports it for the rest of the package.
+"""
+
+from .ai import (  # noqa: F401
+    EXACT, LOWERBOUND, UPPERBOUND, ENTRY_BYTES, BUCKET_ENTRIES, DEFAULT_SIZE_MB, TTEntry,
+    TranspositionTable, encode_move, decode_move,
+)
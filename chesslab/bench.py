@@ -0,0 +1,269 @@
+"""
+Reproducible search benchmark.
+
+Runs choose_alphabeta_move, choose_minimax_move and choose_move (to a fixed
+depth) on a fixed set of positions, each from an empty transposition table,
+and records per search: wall time, nodes, quiescence nodes, nodes per
+second, effective branching factor, TT hit rate and first-move cutoff rate
+(the share of beta cutoffs made by the first move, i.e. how good the move
+ordering is). The results go to a
+JSON file, and two such files can be compared, so a change to
+chesslab/ai/ai.py gets a before and after:
+
+    python main.py --bench before.json
+    ... edit chesslab/ai/ai.py ...
+    python main.py --bench after.json
+    python main.py --bench-compare before.json after.json
+
+The effective branching factor is nodes ** (1 / depth) for a single search,
+and the node ratio of the last two iterations for choose_move.
+
+Older AI files can be benchmarked too: functions without a metrics argument
+get their node counts recorded as null, a choose_move(board) without
+max_depth is stopped after `depth` iterations (or GENERATOR_TIME_CAP), and a
+search that raises is reported and left out instead of ending the run.
+"""
+import importlib.util
+import inspect
+import json
+import platform
+import time
+
+from .board import Board, move_name
+
+DEFAULT_AI = 'chesslab/ai/ai.py'
+
+# Opening, two middlegames, a promotion-heavy position and a pawn endgame
+BENCH_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w",
+    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w",
+]
+
+# (label, function name, depth)
+BENCH_SEARCHES = [
+    ('alphabeta', 'choose_alphabeta_move', 4),
+    ('minimax', 'choose_minimax_move', 3),
+    ('choose_move', 'choose_move', 4),
+]
+
+# Longest a choose_move without a max_depth argument (e.g. an older ai.py) may run
+GENERATOR_TIME_CAP = 60.0
+
+
+def load_ai_module(path=DEFAULT_AI):
+    """Import an AI file the way the harness does (package context for relative imports)."""
+    spec = importlib.util.spec_from_file_location(
+        "chesslab.ai.custom_ai",
+        path,
+        submodule_search_locations=[]
+    )
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = "chesslab.ai"
+    spec.loader.exec_module(module)
+    return module
+
+
+def _ebf(nodes, depth):
+    if nodes is None:
+        return None
+    return nodes ** (1.0 / depth) if nodes and depth else 0.0
+
+
+def run_search(module, func_name, board, depth):
+    """One timed search; returns the result record (without fen/label)."""
+    engine = getattr(module, 'ENGINE', None)
+    if engine is not None:
+        # Every search starts cold, so the numbers do not depend on what ran before
+        engine.reset()
+    if hasattr(module, '_BOOK'):
+        # Measure the search, not the opening book or the endgame tables
+        module._BOOK = False
+    if hasattr(module, '_TABLEBASES'):
+        module._TABLEBASES = False
+    func = getattr(module, func_name)
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        params = {}
+    # Older AI files may take neither metrics nor max_depth; their counters are then unknown (None)
+    counted = 'metrics' in params
+    metrics = {}
+    kwargs = {'metrics': metrics} if counted else {}
+    start = time.perf_counter()
+    if func_name == 'choose_move':
+        move = None
+        if 'max_depth' in params:
+            for move in func(board.clone(), max_depth=depth, **kwargs):
+                pass
+        else:
+            # Without a depth limit: the first move is the immediate fallback,
+            # then one per completed depth, so stop after depth + 1 of them
+            for yielded, move in enumerate(func(board.clone(), **kwargs), 1):
+                if yielded > depth or time.perf_counter() - start > GENERATOR_TIME_CAP:
+                    break
+        elapsed = time.perf_counter() - start
+        # choose_move adds its iterations' counters up in metrics
+        nodes = metrics.get('nodes', 0) if counted else None
+        iterations = metrics.get('iterations', [])
+        if len(iterations) >= 2 and iterations[-2].get('nodes'):
+            ebf = iterations[-1]['nodes'] / iterations[-2]['nodes']
+        else:
+            ebf = _ebf(nodes, depth)
+    else:
+        ret = func(board.clone(), depth=depth, **kwargs)
+        elapsed = time.perf_counter() - start
+        move, nodes = ret if isinstance(ret, tuple) else (ret, metrics.get('nodes', 0) if counted else None)
+        ebf = _ebf(nodes, depth)
+    probes = metrics.get('tt_probes', 0)
+    cutoffs = metrics.get('cutoffs', 0)
+    return {
+        'depth': depth,
+        'move': _move_name(move),
+        'seconds': elapsed,
+        'nodes': nodes,
+        'qnodes': metrics.get('qnodes'),
+        'nps': nodes / elapsed if nodes is not None and elapsed > 0 else None,
+        'ebf': ebf,
+        'tt_probes': probes,
+        'tt_hit_rate': metrics.get('tt_hits', 0) / probes if probes else None,
+        'cutoffs': cutoffs,
+        'first_move_cutoff_rate': metrics.get('first_move_cutoffs', 0) / cutoffs if cutoffs else None,
+    }
+
+
+def _move_name(move):
+    return move_name(move) if move is not None else None
+
+
+def run_bench(out_path='bench.json', ai_path=DEFAULT_AI, fens=BENCH_FENS, searches=BENCH_SEARCHES,
+              backend='mailbox', repeat=1, out=print):
+    """
+    Run every search on every position and write the results to out_path.
+    With repeat > 1 each search runs that many times and the fastest time is kept.
+    Returns the report dict.
+    """
+    module = load_ai_module(ai_path)
+    results = []
+    errors = []
+    out(f"{'search':<12} {'depth':>5} {'seconds':>8} {'nodes':>9} {'qnodes':>9} {'nps':>9} "
+        f"{'ebf':>6} {'tt hit':>7}  move   position")
+    for label, func_name, depth in searches:
+        if not hasattr(module, func_name):
+            out(f"{label}: {ai_path} has no {func_name}, skipped")
+            continue
+        for fen in fens:
+            board = Board.from_fen(fen, backend)
+            record = None
+            try:
+                for _ in range(max(1, repeat)):
+                    # A fresh copy of the module per search: an AI may keep its
+                    # TT or other search state in module globals
+                    run = run_search(load_ai_module(ai_path), func_name, board, depth)
+                    if record is None or run['seconds'] < record['seconds']:
+                        record = run
+            except Exception as e:
+                # One search the AI file cannot run does not end the benchmark
+                error = f"{type(e).__name__}: {e}"
+                errors.append({'search': label, 'fen': fen, 'error': error})
+                out(f"{label:<12} {depth:>5} failed: {error}  {fen.split()[0]}")
+                continue
+            record = {'search': label, 'fen': fen, **record}
+            results.append(record)
+            out(_format(record))
+
+    totals = {}
+    for record in results:
+        total = totals.setdefault(record['search'], {'seconds': 0.0, 'nodes': 0, 'qnodes': 0})
+        total['seconds'] += record['seconds']
+        # A total is unknown once one of its searches did not count
+        for key in ('nodes', 'qnodes'):
+            total[key] = None if total[key] is None or record[key] is None else total[key] + record[key]
+    for label, total in totals.items():
+        if total['nodes'] is None:
+            total['nps'] = None
+            out(f"{label:<12} total {total['seconds']:>8.2f}s (nodes not reported)")
+        else:
+            total['nps'] = total['nodes'] / total['seconds'] if total['seconds'] else 0.0
+            out(f"{label:<12} total {total['seconds']:>8.2f}s {total['nodes']:>9} nodes {total['nps']:>9,.0f} nps")
+
+    report = {
+        'ai': ai_path,
+        'backend': backend,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+        'errors': errors,
+        'totals': totals,
+    }
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        out(f"Results written to {out_path}")
+    return report
+
+
+def _format(record):
+    hit = record['tt_hit_rate']
+    hit = f"{hit:>6.1%}" if hit is not None else f"{'-':>6}"
+    nodes, qnodes, nps, ebf = (record[key] for key in ('nodes', 'qnodes', 'nps', 'ebf'))
+    return (f"{record['search']:<12} {record['depth']:>5} {record['seconds']:>8.3f} "
+            f"{'-' if nodes is None else nodes:>9} {'-' if qnodes is None else qnodes:>9} "
+            f"{'-' if nps is None else f'{nps:,.0f}':>9} {'-' if ebf is None else f'{ebf:.2f}':>6} {hit:>7}  "
+            f"{record['move'] or '-':<6} {record['fen'].split()[0]}")
+
+
+def _change(old, new):
+    if not old or new is None:
+        return f"{'n/a':>8}"
+    return f"{(new - old) / old:>+8.1%}"
+
+
+def _ebf_text(ebf):
+    return '-' if ebf is None else f"{ebf:.2f}"
+
+
+def compare(old_path, new_path, out=print):
+    """
+    Print the change in time, nodes, NPS and branching factor per search and
+    position from the run in old_path to the run in new_path, and flag
+    positions where the chosen move changed. Returns the list of (search, fen, old, new) pairs.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    before = {(r['search'], r['fen']): r for r in old['results']}
+    pairs = []
+    out(f"{old_path} -> {new_path}")
+    out(f"{'search':<12} {'time':>8} {'nodes':>8} {'nps':>8} {'ebf':>12}  move           position")
+    for record in new['results']:
+        key = (record['search'], record['fen'])
+        if key not in before:
+            continue
+        prev = before[key]
+        pairs.append((key[0], key[1], prev, record))
+        moved = '' if prev['move'] == record['move'] else f"{prev['move']}->{record['move']}"
+        if prev['depth'] != record['depth']:
+            moved += f" (depth {prev['depth']}->{record['depth']})"
+        out(f"{key[0]:<12} {_change(prev['seconds'], record['seconds'])} "
+            f"{_change(prev['nodes'], record['nodes'])} {_change(prev['nps'], record['nps'])} "
+            f"{_ebf_text(prev['ebf']):>5}->{_ebf_text(record['ebf']):<5}  {moved:<14} {key[1].split()[0]}")
+    for label in sorted({r['search'] for r in new['results']}):
+        rates = [(p[2].get('first_move_cutoff_rate'), p[3].get('first_move_cutoff_rate'))
+                 for p in pairs if p[0] == label]
+        rates = [(a, b) for a, b in rates if a is not None and b is not None]
+        if rates:
+            before_rate = sum(a for a, _ in rates) / len(rates)
+            after_rate = sum(b for _, b in rates) / len(rates)
+            out(f"{label:<12} first-move cutoff rate {before_rate:.1%} -> {after_rate:.1%}")
+    for label, total in new.get('totals', {}).items():
+        prev = old.get('totals', {}).get(label)
+        if prev:
+            out(f"{label:<12} total time {_change(prev['seconds'], total['seconds'])}  "
+                f"nodes {_change(prev['nodes'], total['nodes'])}  nps {_change(prev['nps'], total['nps'])}")
+    return pairs
@@ -0,0 +1,185 @@
+"""Bitboard engine for ChessLab.
+
+BitBoard keeps one 64-bit occupancy int per piece code plus one per colour,
+with square index r*8+c (row 0 is Black's back rank, as in Board). Knight,
+king and pawn attacks come from precomputed masks and sliding attacks from
+precomputed rays cut at the first blocker. The 8x8 `board` list is kept in
+step so piece_at, the GUI and the evaluation see the same position.
+
+Build one with Board(backend='bitboard') or Board.from_fen(fen, 'bitboard').
+
+It is not faster than the mailbox Board, which gained piece lists and
+make/unmake in the same series: both generate moves in about 0.1 ms per
+position (the original board took about 0.4 ms) and run perft at the same
+rate. It is a second, independent move generator: perft --board bitboard
+cross-checks the mailbox one.
+"""
+from .board import Board, Move, WHITE, BLACK, PIECE_OFFSETS, PIECES, ZOBRIST, ZOBRIST_SIDE
+
+SQ_RC=tuple((s>>3,s&7) for s in range(64))
+BIT=tuple(1<<s for s in range(64))
+PROMO_ROWS=0xFF|(0xFF<<56)
+
+def _leaper(offsets):
+    masks=[]
+    for s in range(64):
+        r,c=SQ_RC[s]; m=0
+        for dr,dc in offsets:
+            if 0<=r+dr<8 and 0<=c+dc<8: m|=BIT[(r+dr)*8+c+dc]
+        masks.append(m)
+    return tuple(masks)
+
+def _ray(dr,dc):
+    rays=[]
+    for s in range(64):
+        r,c=SQ_RC[s]; m=0; r+=dr; c+=dc
+        while 0<=r<8 and 0<=c<8: m|=BIT[r*8+c]; r+=dr; c+=dc
+        rays.append(m)
+    return tuple(rays)
+
+KNIGHT=_leaper(PIECE_OFFSETS['N'])
+KING=_leaper(PIECE_OFFSETS['K'])
+# PAWN_ATTACKS[color][s]: squares a pawn of `color` standing on s attacks
+PAWN_ATTACKS={WHITE:_leaper([(-1,-1),(-1,1)]), BLACK:_leaper([(1,-1),(1,1)])}
+# (rays, positive) pairs; positive rays run towards higher square indices so the nearest blocker is the lowest set bit
+DIAG_RAYS=tuple((_ray(dr,dc), dr>0) for dr,dc in PIECE_OFFSETS['B'])
+ORTH_RAYS=tuple((_ray(dr,dc), dr>0 or (dr==0 and dc>0)) for dr,dc in PIECE_OFFSETS['R'])
+
+def slider_attacks(s, occ, rays):
+    att=0
+    for ray,positive in rays:
+        a=ray[s]; blk=a&occ
+        if blk: a^=ray[(blk&-blk).bit_length()-1 if positive else blk.bit_length()-1]
+        att|=a
+    return att
+
+def squares(bb):
+    """Yield the square indices of the set bits of bb, lowest first."""
+    while bb:
+        low=bb&-bb; yield low.bit_length()-1; bb^=low
+
+class BitBoard(Board):
+    backend='bitboard'
+    def _index(self):
+        """Build the bitboards from the 8x8 list (these replace the mailbox board's piece lists)."""
+        self.bb=dict.fromkeys(PIECES,0); self.occ={WHITE:0,BLACK:0}
+        for s in range(64):
+            pc=self.board[s>>3][s&7]
+            if pc: self.bb[pc]|=BIT[s]; self.occ[pc[0]]|=BIT[s]
+    def occupied(self):
+        for pc in PIECES:
+            for s in squares(self.bb[pc]): yield pc,s>>3,s&7
+    def clone(self):
+        b=self._copy_state(BitBoard.__new__(BitBoard)); b.bb=self.bb.copy(); b.occ=self.occ.copy(); return b
+    def set_piece(self,r,c,pc):
+        self.board[r][c]=pc; self._sync()
+    def kings_pos(self,color):
+        k=self.bb[color+'K']
+        return SQ_RC[k.bit_length()-1] if k else None
+    def has_non_pawn_material(self,color):
+        bb=self.bb; return bool(bb[color+'N']|bb[color+'B']|bb[color+'R']|bb[color+'Q'])
+    def piece_count(self): return bin(self.occ[WHITE]|self.occ[BLACK]).count('1')
+    def _attacked(self, s, by, occ, gone=0):
+        """Is square s attacked by colour `by` given occupancy occ, ignoring `by` pieces on the squares in gone?"""
+        bb=self.bb; keep=~gone
+        if KNIGHT[s]&bb[by+'N']&keep or KING[s]&bb[by+'K']: return True
+        if PAWN_ATTACKS[WHITE if by==BLACK else BLACK][s]&bb[by+'P']&keep: return True
+        q=bb[by+'Q']
+        bq=(bb[by+'B']|q)&keep
+        if bq and slider_attacks(s,occ,DIAG_RAYS)&bq: return True
+        rq=(bb[by+'R']|q)&keep
+        return bool(rq and slider_attacks(s,occ,ORTH_RAYS)&rq)
+    def is_square_attacked(self, square, by_color):
+        r,c=square
+        return self._attacked(r*8+c, by_color, self.occ[WHITE]|self.occ[BLACK])
+    def _targets(self, color):
+        """Yield (src, dst_mask) for every piece of color; pawns yield their full push/capture mask."""
+        bb=self.bb; own=self.occ[color]; enemy=self.occ[WHITE if color==BLACK else BLACK]; occ=own|enemy; empty=~occ
+        for s in squares(bb[color+'P']):
+            t=PAWN_ATTACKS[color][s]&enemy
+            one=s-8 if color==WHITE else s+8
+            if BIT[one]&empty:
+                t|=BIT[one]
+                if (s>>3)==(6 if color==WHITE else 1):
+                    two=s-16 if color==WHITE else s+16
+                    if BIT[two]&empty: t|=BIT[two]
+            yield s,t
+        for s in squares(bb[color+'N']): yield s,KNIGHT[s]&~own
+        for s in squares(bb[color+'B']): yield s,slider_attacks(s,occ,DIAG_RAYS)&~own
+        for s in squares(bb[color+'R']): yield s,slider_attacks(s,occ,ORTH_RAYS)&~own
+        for s in squares(bb[color+'Q']): yield s,(slider_attacks(s,occ,DIAG_RAYS)|slider_attacks(s,occ,ORTH_RAYS))&~own
+        for s in squares(bb[color+'K']): yield s,KING[s]&~own
+    def generate_pseudo_legal(self):
+        moves=[]; pawns=self.bb[self.turn+'P']
+        for s,t in self._targets(self.turn):
+            src=SQ_RC[s]
+            for d in squares(t): moves.append(Move(src,SQ_RC[d],'Q' if BIT[s]&pawns and BIT[d]&PROMO_ROWS else None))
+        return moves
+    def _checks_and_pins(self, ks, color):
+        """Return (checkers, evasions, pins) for color's king on square ks: evasions is the mask of checking pieces
+        plus the squares between a checking slider and the king; pins maps a pinned square to the mask of its pin line."""
+        bb=self.bb; them=WHITE if color==BLACK else BLACK; own=self.occ[color]; occ=own|self.occ[them]
+        checkers=KNIGHT[ks]&bb[them+'N'] | PAWN_ATTACKS[color][ks]&bb[them+'P']; evasions=checkers; pins={}
+        for rays,sliders in ((DIAG_RAYS,bb[them+'B']|bb[them+'Q']), (ORTH_RAYS,bb[them+'R']|bb[them+'Q'])):
+            for ray,positive in rays:
+                a=ray[ks]; blk=a&occ
+                if not blk: continue
+                first=(blk&-blk).bit_length()-1 if positive else blk.bit_length()-1
+                if BIT[first]&sliders: checkers|=BIT[first]; evasions|=a^ray[first]
+                elif BIT[first]&own and sliders:
+                    rest=blk^BIT[first]
+                    if not rest: continue
+                    second=(rest&-rest).bit_length()-1 if positive else rest.bit_length()-1
+                    if BIT[second]&sliders: pins[first]=a^ray[second]
+        return checkers,evasions,pins
+    def _gen_legal(self, first=False, loud=False, quiet=False):
+        """Emit only legal moves: checkers and pins are computed once, non-king targets are masked by the evasion
+        squares and pin lines, and king targets are tested against attacks with the king lifted off the board.
+        loud=True masks targets down to captures and promotions, quiet=True to everything else."""
+        color=self.turn; them=WHITE if color==BLACK else BLACK; king=self.bb[color+'K']
+        if not king: self._ccheck=False; return []
+        ks=king.bit_length()-1; checkers,evasions,pins=self._checks_and_pins(ks,color); self._ccheck=bool(checkers)
+        double=checkers&(checkers-1); occ=(self.occ[WHITE]|self.occ[BLACK])^king
+        pawns=self.bb[color+'P']; enemy=self.occ[them]; legal=[]
+        for s,t in self._targets(color):
+            src=SQ_RC[s]; frm=BIT[s]
+            if loud: t&=enemy|PROMO_ROWS if frm&pawns else enemy
+            elif quiet: t&=~(enemy|PROMO_ROWS) if frm&pawns else ~enemy
+            if frm==king:
+                for d in squares(t):
+                    if not self._attacked(d, them, occ): legal.append(Move(src,SQ_RC[d]))
+                if first and legal: return legal
+                continue
+            if double: continue
+            if checkers: t&=evasions
+            if s in pins: t&=pins[s]
+            if frm&pawns:
+                for d in squares(t): legal.append(Move(src,SQ_RC[d],'Q' if BIT[d]&PROMO_ROWS else None))
+            else:
+                for d in squares(t): legal.append(Move(src,SQ_RC[d]))
+            if first and legal: return legal
+        return legal
+    def make(self, move):
+        (r1,c1),(r2,c2),promo=move
+        pc=self.board[r1][c1]; cap=self.board[r2][c2]; s1=r1*8+c1; s2=r2*8+c2; frm=BIT[s1]; to=BIT[s2]; bb=self.bb
+        key=self._zobrist; self.history.append((move,pc,cap,key,self.mg_score,self.eg_score,self.phase))
+        self.board[r1][c1]=None; self.board[r2][c2]=pc
+        bb[pc]^=frm|to; self.occ[pc[0]]^=frm|to
+        key^=ZOBRIST[pc][s1]^ZOBRIST_SIDE
+        if cap: bb[cap]^=to; self.occ[cap[0]]^=to; key^=ZOBRIST[cap][s2]
+        new=pc
+        if promo: new=pc[0]+promo; self.board[r2][c2]=new; bb[pc]^=to; bb[new]|=to
+        self._zobrist=key^ZOBRIST[new][s2]; self.turn=self.enemy(self.turn)
+        t=self.psqt
+        if t:
+            self.mg_score+=t.mg[new][s2]-t.mg[pc][s1]; self.eg_score+=t.eg[new][s2]-t.eg[pc][s1]
+            if promo: self.phase+=t.phase[new]-t.phase[pc]
+            if cap: self.mg_score-=t.mg[cap][s2]; self.eg_score-=t.eg[cap][s2]; self.phase-=t.phase[cap]
+    def unmake(self):
+        move,pc,cap,self._zobrist,self.mg_score,self.eg_score,self.phase=self.history.pop(); (r1,c1),(r2,c2),promo=move
+        frm=BIT[r1*8+c1]; to=BIT[r2*8+c2]; bb=self.bb
+        if promo: bb[pc[0]+promo]^=to; bb[pc]|=to
+        bb[pc]^=frm|to; self.occ[pc[0]]^=frm|to
+        if cap: bb[cap]|=to; self.occ[cap[0]]|=to
+        self.board[r1][c1]=pc; self.board[r2][c2]=cap
+        self.turn=self.enemy(self.turn); return move
@@ -1,5 +1,6 @@
 
 from copy import deepcopy  # Used only for START_POS initialization
+import random
 WHITE, BLACK='w','b'
 PIECE_OFFSETS={'N':[(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)],
 'B':[(-1,-1),(-1,1),(1,-1),(1,1)],
@@ -13,113 +14,342 @@ START_POS=[
 ['wP','wP','wP','wP','wP','wP','wP','wP'],
 ['wR','wN','wB','wQ','wK','wB','wN','wR'],
 ]
+PIECES=('wP','wN','wB','wR','wQ','wK','bP','bN','bB','bR','bQ','bK')
+# Zobrist keys: one random 64-bit word per (piece, square r*8+c) plus one for Black to move; fixed seed so keys are stable across processes
+_zrng=random.Random(0xC0FFEE)
+ZOBRIST={pc:tuple(_zrng.getrandbits(64) for _ in range(64)) for pc in PIECES}
+ZOBRIST_SIDE=_zrng.getrandbits(64)
+class PieceSquareTables:
+    """Per-square scores a Board keeps summed incrementally (see Board.set_psqt).
+
+    mg[pc] and eg[pc] are 64-entry lists indexed by r*8+c holding the middlegame
+    and endgame value of piece pc on that square, already signed from White's
+    point of view; phase[pc] is the piece's game-phase weight."""
+    __slots__=('mg','eg','phase')
+    def __init__(self, mg, eg, phase): self.mg=mg; self.eg=eg; self.phase=phase
 class Move:
     __slots__=('src','dst','promote')
     def __init__(self, src,dst,promote=None): self.src=src; self.dst=dst; self.promote=promote
     def __iter__(self): return iter((self.src,self.dst,self.promote))
     def __repr__(self): return f"Move({self.src}->{self.dst}{','+self.promote if self.promote else ''})"
+FILES='abcdefgh'
+def square_name(square): r,c=square; return FILES[c]+str(8-r)
+def move_name(move):
+    """Coordinate notation, e.g. 'e2e4' or 'a7a8q'."""
+    return square_name(move.src)+square_name(move.dst)+(move.promote.lower() if move.promote else '')
+# Ordering values for legal_captures: most valuable victim first, then least valuable attacker; a promotion counts as winning 8 pawns
+MVV_LVA_VALUE={'P':1,'N':3,'B':3,'R':5,'Q':9,'K':20}
+BACKENDS=('mailbox','bitboard')
+FEN_START='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'
 class Board:
-    def __init__(self): self.board=deepcopy(START_POS); self.turn=WHITE; self.history=[]
-    def clone(self):
-        b=Board.__new__(Board); b.board=[row[:] for row in self.board]; b.turn=self.turn; b.history=list(self.history); return b
-    def piece_at(self,r,c): return self.board[r][c]
-    def set_piece(self,r,c,pc): self.board[r][c]=pc
-    def kings_pos(self,color):
+    """8x8 mailbox board. Board(backend='bitboard') builds the bitboard engine (chesslab.bitboard.BitBoard) behind the same API."""
+    backend='mailbox'
+    def __new__(cls, backend='mailbox'):
+        if backend not in BACKENDS: raise ValueError(f"unknown board backend: {backend!r}")
+        if cls is Board and backend=='bitboard':
+            from .bitboard import BitBoard
+            cls=BitBoard
+        return object.__new__(cls)
+    def __init__(self, backend='mailbox'): self.board=deepcopy(START_POS); self.turn=WHITE; self.history=[]; self.psqt=None; self._sync()
+    @property
+    def zobrist(self):
+        """64-bit Zobrist key of the position (pieces and side to move), updated incrementally by make/unmake."""
+        return self._zobrist
+    @classmethod
+    def from_fen(cls, fen, backend='mailbox'):
+        """Build a board from the placement and side-to-move fields of a FEN string (castling/en passant fields are ignored)."""
+        fields=fen.split(); b=cls(backend); b.board=[]
+        for rank in fields[0].split('/'):
+            row=[]
+            for ch in rank:
+                if ch.isdigit(): row.extend([None]*int(ch))
+                else: row.append(('w' if ch.isupper() else 'b')+ch.upper())
+            b.board.append(row)
+        if len(b.board)!=8 or any(len(row)!=8 for row in b.board): raise ValueError(f"bad FEN placement: {fields[0]!r}")
+        b.turn=WHITE if len(fields)<2 or fields[1]=='w' else BLACK
+        b._sync(); return b
+    def fen(self):
+        ranks=[]
+        for row in self.board:
+            out=''; empty=0
+            for pc in row:
+                if pc is None: empty+=1; continue
+                if empty: out+=str(empty); empty=0
+                out+=pc[1] if pc[0]==WHITE else pc[1].lower()
+            ranks.append(out+(str(empty) if empty else ''))
+        return '/'.join(ranks)+' '+self.turn+' - - 0 1'
+    def _sync(self):
+        """Recompute derived state (Zobrist key, piece-square sums) from the 8x8 list after construction or direct edits."""
+        key=ZOBRIST_SIDE if self.turn==BLACK else 0
         for r in range(8):
             for c in range(8):
-                if self.board[r][c]==color+'K': return (r,c)
-        return None
+                pc=self.board[r][c]
+                if pc: key^=ZOBRIST[pc][r*8+c]
+        self._zobrist=key; self._ckey=None; self._index(); self.set_psqt(self.psqt)
+    def _index(self):
+        """Build the piece lists (set of (r,c) squares per piece code) and king squares that make/unmake maintain."""
+        self.pieces={pc:set() for pc in PIECES}; self.king_sq={WHITE:None,BLACK:None}
+        for r in range(8):
+            for c in range(8):
+                pc=self.board[r][c]
+                if pc:
+                    self.pieces[pc].add((r,c))
+                    if pc[1]=='K': self.king_sq[pc[0]]=(r,c)
+    def occupied(self):
+        """Yield (piece, r, c) for every piece on the board."""
+        for pc,sqs in self.pieces.items():
+            for r,c in sqs: yield pc,r,c
+    def set_psqt(self, psqt):
+        """Attach PieceSquareTables (or None) and rescan: make/unmake then keep mg_score, eg_score and phase up to date."""
+        self.psqt=psqt; mg=eg=phase=0
+        if psqt:
+            for pc,r,c in self.occupied(): mg+=psqt.mg[pc][r*8+c]; eg+=psqt.eg[pc][r*8+c]; phase+=psqt.phase[pc]
+        self.mg_score=mg; self.eg_score=eg; self.phase=phase
+    def _copy_state(self, b):
+        b.board=[row[:] for row in self.board]; b.turn=self.turn; b.history=list(self.history); b._zobrist=self._zobrist; b._ckey=None
+        b.psqt=self.psqt; b.mg_score=self.mg_score; b.eg_score=self.eg_score; b.phase=self.phase; return b
+    def clone(self):
+        b=self._copy_state(Board.__new__(Board)); b.pieces={pc:set(sqs) for pc,sqs in self.pieces.items()}; b.king_sq=dict(self.king_sq); return b
+    def piece_at(self,r,c): return self.board[r][c]
+    def set_piece(self,r,c,pc): self.board[r][c]=pc; self._sync()
+    def kings_pos(self,color): return self.king_sq[color]
+    def has_non_pawn_material(self,color):
+        """Does color have a knight, bishop, rook or queen?"""
+        return any(self.pieces[color+t] for t in 'NBRQ')
+    def piece_count(self):
+        """Number of pieces on the board, kings included."""
+        return sum(len(sqs) for sqs in self.pieces.values())
     def in_bounds(self,r,c): return 0<=r<8 and 0<=c<8
     def enemy(self,color): return BLACK if color==WHITE else WHITE
     def generate_pseudo_legal(self):
         color=self.turn; moves=[]
-        for r in range(8):
-            for c in range(8):
-                pc=self.board[r][c]
-                if not pc or pc[0]!=color: continue
-                k=pc[1]
-                if k=='P':
-                    d=-1 if color==WHITE else 1; start=6 if color==WHITE else 1
-                    nr=r+d
-                    if self.in_bounds(nr,c) and self.board[nr][c] is None:
-                        moves.append(Move((r,c),(nr,c),'Q' if nr in (0,7) else None))
-                        nr2=r+2*d
-                        if r==start and self.board[nr2][c] is None:
-                            moves.append(Move((r,c),(nr2,c)))
-                    for dc in (-1,1):
-                        nc=c+dc
-                        if self.in_bounds(nr,nc) and self.board[nr][nc] and self.board[nr][nc][0]!=color:
-                            moves.append(Move((r,c),(nr,nc),'Q' if nr in (0,7) else None))
-                elif k=='N':
-                    for dr,dc in PIECE_OFFSETS['N']:
-                        nr,nc=r+dr,c+dc
-                        if not self.in_bounds(nr,nc): continue
-                        tgt=self.board[nr][nc]
-                        if tgt is None or tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
-                elif k in 'BRQ':
-                    dirs=PIECE_OFFSETS['B'] if k=='B' else PIECE_OFFSETS['R'] if k=='R' else PIECE_OFFSETS['Q']
-                    for dr,dc in dirs:
-                        nr,nc=r+dr,c+dc
-                        while self.in_bounds(nr,nc):
-                            tgt=self.board[nr][nc]
-                            if tgt is None: moves.append(Move((r,c),(nr,nc)))
-                            else:
-                                if tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
-                                break
-                            nr+=dr; nc+=dc
-                else:
-                    for dr,dc in PIECE_OFFSETS['K']:
-                        nr,nc=r+dr,c+dc
-                        if not self.in_bounds(nr,nc): continue
-                        tgt=self.board[nr][nc]
-                        if tgt is None or tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
+        for k in 'PNBRQK':
+            pc=color+k
+            for r,c in self.pieces[pc]: self._piece_moves(r,c,pc,moves)
+        return moves
+    def _piece_moves(self, r, c, pc, moves):
+        """Append the pseudo-legal moves of piece pc standing on (r,c) to moves."""
+        color,k=pc[0],pc[1]
+        if k=='P':
+            d=-1 if color==WHITE else 1; start=6 if color==WHITE else 1
+            nr=r+d
+            if self.in_bounds(nr,c) and self.board[nr][c] is None:
+                moves.append(Move((r,c),(nr,c),'Q' if nr in (0,7) else None))
+                nr2=r+2*d
+                if r==start and self.board[nr2][c] is None:
+                    moves.append(Move((r,c),(nr2,c)))
+            for dc in (-1,1):
+                nc=c+dc
+                if self.in_bounds(nr,nc) and self.board[nr][nc] and self.board[nr][nc][0]!=color:
+                    moves.append(Move((r,c),(nr,nc),'Q' if nr in (0,7) else None))
+        elif k=='N':
+            for dr,dc in PIECE_OFFSETS['N']:
+                nr,nc=r+dr,c+dc
+                if not self.in_bounds(nr,nc): continue
+                tgt=self.board[nr][nc]
+                if tgt is None or tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
+        elif k in 'BRQ':
+            dirs=PIECE_OFFSETS['B'] if k=='B' else PIECE_OFFSETS['R'] if k=='R' else PIECE_OFFSETS['Q']
+            for dr,dc in dirs:
+                nr,nc=r+dr,c+dc
+                while self.in_bounds(nr,nc):
+                    tgt=self.board[nr][nc]
+                    if tgt is None: moves.append(Move((r,c),(nr,nc)))
+                    else:
+                        if tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
+                        break
+                    nr+=dr; nc+=dc
+        else:
+            for dr,dc in PIECE_OFFSETS['K']:
+                nr,nc=r+dr,c+dc
+                if not self.in_bounds(nr,nc): continue
+                tgt=self.board[nr][nc]
+                if tgt is None or tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
+        return moves
+    def _piece_captures(self, r, c, pc, moves):
+        """Append the pseudo-legal captures and promotions of piece pc standing on (r,c) to moves."""
+        color,k=pc[0],pc[1]; b=self.board
+        if k=='P':
+            nr=r-1 if color==WHITE else r+1; promo='Q' if nr in (0,7) else None
+            if promo and b[nr][c] is None: moves.append(Move((r,c),(nr,c),promo))
+            for nc in (c-1,c+1):
+                if 0<=nc<8 and b[nr][nc] and b[nr][nc][0]!=color: moves.append(Move((r,c),(nr,nc),promo))
+        elif k in 'NK':
+            for dr,dc in PIECE_OFFSETS[k]:
+                nr,nc=r+dr,c+dc
+                if 0<=nr<8 and 0<=nc<8 and b[nr][nc] and b[nr][nc][0]!=color: moves.append(Move((r,c),(nr,nc)))
+        else:
+            for dr,dc in PIECE_OFFSETS[k]:
+                nr,nc=r+dr,c+dc
+                while 0<=nr<8 and 0<=nc<8:
+                    tgt=b[nr][nc]
+                    if tgt:
+                        if tgt[0]!=color: moves.append(Move((r,c),(nr,nc)))
+                        break
+                    nr+=dr; nc+=dc
         return moves
+    def _clear_path(self, r, c, r0, c0):
+        """Are all squares strictly between (r,c) and (r0,c0), which share a line, empty?"""
+        sr=(r0>r)-(r0<r); sc=(c0>c)-(c0<c); r+=sr; c+=sc; b=self.board
+        while r!=r0 or c!=c0:
+            if b[r][c]: return False
+            r+=sr; c+=sc
+        return True
     def is_square_attacked(self, square, by_color):
-        rK,cK=square
-        for dr,dc in PIECE_OFFSETS['N']:
-            nr,nc=rK+dr,cK+dc
-            if self.in_bounds(nr,nc) and self.board[nr][nc]==by_color+'N': return True
-        for dr,dc in PIECE_OFFSETS['B']:
-            nr,nc=rK+dr,cK+dc
-            while self.in_bounds(nr,nc):
-                pc=self.board[nr][nc]
-                if pc:
-                    if pc[0]==by_color and pc[1] in 'BQ': return True
-                    break
-                nr+=dr; nc+=dc
-        for dr,dc in PIECE_OFFSETS['R']:
-            nr,nc=rK+dr,cK+dc
-            while self.in_bounds(nr,nc):
-                pc=self.board[nr][nc]
-                if pc:
-                    if pc[0]==by_color and pc[1] in 'RQ': return True
-                    break
-                nr+=dr; nc+=dc
-        for dr,dc in PIECE_OFFSETS['K']:
-            nr,nc=rK+dr,cK+dc
-            if self.in_bounds(nr,nc) and self.board[nr][nc]==by_color+'K': return True
+        """Probe only the attacker's pieces: pawn and king squares next to the target, then its knight and slider lists."""
+        r0,c0=square; p=self.pieces; b=self.board
         d=1 if by_color==WHITE else -1
         for dc in (-1,1):
-            nr,nc=rK+d,cK+dc
-            if self.in_bounds(nr,nc) and self.board[nr][nc]==by_color+'P': return True
+            nr,nc=r0+d,c0+dc
+            if 0<=nr<8 and 0<=nc<8 and b[nr][nc]==by_color+'P': return True
+        k=self.king_sq[by_color]
+        if k and abs(k[0]-r0)<=1 and abs(k[1]-c0)<=1: return True
+        for r,c in p[by_color+'N']:
+            if (r-r0)*(r-r0)+(c-c0)*(c-c0)==5: return True
+        for kind in 'BRQ':
+            for r,c in p[by_color+kind]:
+                dr,dc=r0-r,c0-c
+                if not (dr or dc): continue  # a piece being captured on the target square does not defend it
+                if (kind!='R' and abs(dr)==abs(dc) or kind!='B' and (dr==0 or dc==0)) and self._clear_path(r,c,r0,c0): return True
         return False
     def make(self, move):
+        """Apply move, pushing an undo record (move, moved piece, captured piece, previous key and score sums) onto history."""
         (r1,c1),(r2,c2),promo=move
-        pc=self.board[r1][c1]; self.board[r1][c1]=None; self.board[r2][c2]=pc
-        if promo: self.board[r2][c2]=pc[0]+promo
-        self.turn=self.enemy(self.turn)
-    def legal_moves(self):
-        legal=[]
-        for mv in self.generate_pseudo_legal():
-            b2=self.clone(); b2.make(mv)
-            kpos=b2.kings_pos(b2.enemy(b2.turn))
-            if kpos and not b2.is_square_attacked(kpos, b2.turn): legal.append(mv)
+        pc=self.board[r1][c1]; cap=self.board[r2][c2]; s1=r1*8+c1; s2=r2*8+c2; src=move.src; dst=move.dst
+        self.history.append((move,pc,cap,self._zobrist,self.mg_score,self.eg_score,self.phase))
+        new=pc[0]+promo if promo else pc
+        self.board[r1][c1]=None; self.board[r2][c2]=new
+        p=self.pieces; p[pc].remove(src); p[new].add(dst)
+        if pc[1]=='K': self.king_sq[pc[0]]=dst
+        if cap:
+            p[cap].remove(dst)
+            if cap[1]=='K': self.king_sq[cap[0]]=None
+        key=self._zobrist^ZOBRIST[pc][s1]^ZOBRIST[new][s2]^ZOBRIST_SIDE
+        if cap: key^=ZOBRIST[cap][s2]
+        self._zobrist=key; self.turn=self.enemy(self.turn)
+        t=self.psqt
+        if t:
+            self.mg_score+=t.mg[new][s2]-t.mg[pc][s1]; self.eg_score+=t.eg[new][s2]-t.eg[pc][s1]
+            if promo: self.phase+=t.phase[new]-t.phase[pc]
+            if cap: self.mg_score-=t.mg[cap][s2]; self.eg_score-=t.eg[cap][s2]; self.phase-=t.phase[cap]
+    def unmake(self):
+        """Take back the last make(): restore the moved piece, the captured piece, the side to move, the key and the score sums."""
+        move,pc,cap,self._zobrist,self.mg_score,self.eg_score,self.phase=self.history.pop(); (r1,c1),(r2,c2),_=move
+        src=move.src; dst=move.dst; p=self.pieces
+        p[self.board[r2][c2]].remove(dst); p[pc].add(src)
+        if pc[1]=='K': self.king_sq[pc[0]]=src
+        if cap:
+            p[cap].add(dst)
+            if cap[1]=='K': self.king_sq[cap[0]]=dst
+        self.board[r1][c1]=pc; self.board[r2][c2]=cap
+        self.turn=self.enemy(self.turn); return move
+    def make_null(self):
+        """Pass the turn without moving (forfeited moves, null-move search); undo with unmake_null()."""
+        self.history.append((None,None,None,self._zobrist,self.mg_score,self.eg_score,self.phase)); self._zobrist^=ZOBRIST_SIDE; self.turn=self.enemy(self.turn)
+    def unmake_null(self):
+        self._zobrist=self.history.pop()[3]; self.turn=self.enemy(self.turn)
+    def _checks_and_pins(self, kpos, color):
+        """Find what attacks color's king from the enemy piece lists: return (checkers, evasions, pins).
+        evasions holds the checking squares plus the squares between a checking slider and the king;
+        pins maps each pinned piece's square to the (dr,dc) line it may still move along."""
+        r0,c0=kpos; them=self.enemy(color); b=self.board; p=self.pieces; checkers=[]; evasions=set(); pins={}
+        for kind in 'BRQ':
+            for r,c in p[them+kind]:
+                dr,dc=r0-r,c0-c
+                if not (kind!='R' and abs(dr)==abs(dc) or kind!='B' and (dr==0 or dc==0)): continue
+                sr=(dr>0)-(dr<0); sc=(dc>0)-(dc<0); nr,nc=r+sr,c+sc; path=[]; blocker=None
+                while nr!=r0 or nc!=c0:
+                    pc=b[nr][nc]
+                    if pc:
+                        if pc[0]!=color or blocker: blocker=False; break  # enemy piece or a second own piece: no pin, no check
+                        blocker=(nr,nc)
+                    path.append((nr,nc)); nr+=sr; nc+=sc
+                if blocker is None: checkers.append((r,c)); evasions.update(path); evasions.add((r,c))
+                elif blocker: pins[blocker]=(sr,sc)
+        for r,c in p[them+'N']:
+            if (r-r0)*(r-r0)+(c-c0)*(c-c0)==5: checkers.append((r,c)); evasions.add((r,c))
+        d=1 if them==WHITE else -1
+        for dc in (-1,1):
+            nr,nc=r0+d,c0+dc
+            if 0<=nr<8 and 0<=nc<8 and b[nr][nc]==them+'P': checkers.append((nr,nc)); evasions.add((nr,nc))
+        return checkers,evasions,pins
+    def _gen_legal(self, first=False, loud=False, quiet=False):
+        """Generate only legal moves: checkers and pins are found once, then evasion squares and pin lines filter
+        the other pieces' moves and king moves are tested against attacks with the king lifted off the board.
+        With first=True, stop after the first piece that has a legal move; loud=True only generates captures
+        and promotions, quiet=True only the remaining moves."""
+        gen=self._piece_captures if loud else self._piece_moves
+        color=self.turn; them=self.enemy(color); kpos=self.kings_pos(color)
+        if kpos is None: self._ccheck=False; return []
+        checkers,evasions,pins=self._checks_and_pins(kpos,color); b=self.board; legal=[]; self._ccheck=bool(checkers)
+        for k in ('PNBRQ' if len(checkers)<2 else '')+'K':
+            pc=color+k
+            for r,c in self.pieces[pc]:
+                if k=='K':
+                    b[r][c]=None  # so sliders see through the square the king leaves
+                    for mv in gen(r,c,pc,[]):
+                        if quiet and b[mv.dst[0]][mv.dst[1]]: continue
+                        if not self.is_square_attacked(mv.dst, them): legal.append(mv)
+                    b[r][c]=pc
+                else:
+                    pin=pins.get((r,c))
+                    for mv in gen(r,c,pc,[]):
+                        r2,c2=mv.dst
+                        if checkers and mv.dst not in evasions: continue
+                        if pin and (r2-r)*pin[1]!=(c2-c)*pin[0]: continue
+                        if quiet and (mv.promote or b[r2][c2]): continue
+                        legal.append(mv)
+                if first and legal: return legal
         return legal
-    def is_check(self, color):
+    # Legal moves, in-check status and the outcome are cached per position: the cache belongs to the
+    # Zobrist key it was filled for and is dropped as soon as make/unmake change the key.
+    def _cache(self):
+        if self._ckey!=self._zobrist: self._ckey=self._zobrist; self._cmoves=None; self._chas=None; self._ccheck=None
+    def legal_moves(self):
+        """Legal moves of the side to move, generated at most once per position (each call returns a fresh list)."""
+        self._cache()
+        if self._cmoves is None: self._cmoves=self._gen_legal(); self._chas=bool(self._cmoves)
+        return list(self._cmoves)
+    def legal_captures(self):
+        """Legal captures and promotions only (the quiescence move set), in MVV-LVA order.
+        Quiet moves are never generated unless the full move list is already cached."""
+        self._cache(); b=self.board
+        if self._cmoves is not None: moves=[m for m in self._cmoves if m.promote or b[m.dst[0]][m.dst[1]]]
+        else: moves=self._gen_legal(loud=True)
+        moves.sort(key=self._mvv_lva, reverse=True)
+        return moves
+    def legal_quiets(self):
+        """Legal moves that neither capture nor promote, in generation order (complement of legal_captures)."""
+        self._cache(); b=self.board
+        if self._cmoves is not None: return [m for m in self._cmoves if not (m.promote or b[m.dst[0]][m.dst[1]])]
+        return self._gen_legal(quiet=True)
+    def is_legal(self, move):
+        """Is move (any (src, dst, promote) triple, e.g. a hash or killer move) legal here? Checks it without generating the move list."""
+        (r1,c1),(r2,c2),promo=move; pc=self.board[r1][c1]
+        if not pc or pc[0]!=self.turn: return False
+        self._cache()
+        if self._cmoves is not None: return any(m.src==(r1,c1) and m.dst==(r2,c2) and m.promote==promo for m in self._cmoves)
+        if not any(m.dst==(r2,c2) and m.promote==promo for m in self._piece_moves(r1,c1,pc,[])): return False
+        self.make(move); ok=not self._king_attacked(pc[0]); self.unmake(); return ok
+    def _mvv_lva(self, m):
+        b=self.board; victim=b[m.dst[0]][m.dst[1]]
+        return ((MVV_LVA_VALUE[victim[1]] if victim else 0)+(8 if m.promote else 0))*32-MVV_LVA_VALUE[b[m.src[0]][m.src[1]][1]]
+    def has_legal_move(self):
+        """Does the side to move have a legal move? Stops generating at the first one found."""
+        self._cache()
+        if self._chas is None: self._chas=bool(self._gen_legal(first=True))
+        return self._chas
+    def in_check(self):
+        """Is the side to move in check? Cached per position."""
+        self._cache()
+        if self._ccheck is None: self._ccheck=self._king_attacked(self.turn)
+        return self._ccheck
+    def _king_attacked(self, color):
         kpos=self.kings_pos(color)
         return self.is_square_attacked(kpos, self.enemy(color)) if kpos else False
+    def is_check(self, color):
+        return self.in_check() if color==self.turn else self._king_attacked(color)
     def outcome(self):
-        moves=self.legal_moves()
-        if moves: return None
-        if self.is_check(self.turn): return ('checkmate', self.enemy(self.turn))
+        if self.has_legal_move(): return None
+        if self.in_check(): return ('checkmate', self.enemy(self.turn))
         return ('stalemate', None)
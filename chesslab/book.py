@@ -0,0 +1,228 @@
+"""
+Opening book: a sorted binary file of (position key, move, weight) records.
+
+The file is read through mmap and searched in place (binary search on the
+key), so opening it costs nothing, and every harness worker process that
+opens the same book shares the same page-cache pages.
+
+File layout, little-endian:
+
+    header   8 bytes   MAGIC
+             4 bytes   record count (uint32)
+             4 bytes   reserved
+    records 12 bytes each, sorted by key, then by weight (highest first):
+             8 bytes   position key, Board.zobrist (uint64)
+             2 bytes   move, encode_move() code (uint16)
+             2 bytes   weight (uint16)
+
+Books are built from played games (e.g. the tournament's JSON-lines output,
+where every move found in a won or drawn game earns weight) or from offline
+searches of the opening tree:
+
+    python main.py --build-book book.bin --book-games tournament.jsonl
+    python main.py --build-book book.bin --book-plies 6 --book-depth 5
+    python main.py --book book.bin --white chesslab/ai/ai.py ...
+"""
+import json
+import mmap
+import os
+import random
+import struct
+
+from .board import Board, FEN_START, move_name
+from .ai.tt import encode_move, decode_move
+
+MAGIC = b'CLBOOK1\x00'
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct('<QHH')
+WEIGHT_MAX = 0xFFFF
+
+
+class OpeningBook:
+    """A read-only, memory-mapped book file. Call close() when done."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path}: empty book file")
+        magic, self.count, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or len(self.mm) < HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError(f"{path}: not a ChessLab opening book")
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, i):
+        return struct.unpack_from('<Q', self.mm, HEADER.size + i * RECORD.size)[0]
+
+    def entries(self, key):
+        """[(move code, weight)] stored for position key, highest weight first."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        offset = HEADER.size + lo * RECORD.size
+        while lo < self.count:
+            k, code, weight = RECORD.unpack_from(self.mm, offset)
+            if k != key:
+                break
+            found.append((code, weight))
+            lo += 1
+            offset += RECORD.size
+        return found
+
+    def moves(self, board):
+        """[(Move, weight)] for board; a key collision cannot produce an illegal move."""
+        result = []
+        for code, weight in self.entries(board.zobrist):
+            move = decode_move(code)
+            if weight and board.is_legal(move):
+                result.append((move, weight))
+        return result
+
+    def choose(self, board, rng=random):
+        """A book move for board picked at random in proportion to weight, or None."""
+        moves = self.moves(board)
+        if not moves:
+            return None
+        return rng.choices([m for m, _ in moves], weights=[w for _, w in moves])[0]
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.file.close()
+
+
+def write_book(path, weights):
+    """
+    Write {(key, move code): weight} to path as a book file. Weights are
+    scaled down to fit 16 bits; entries with weight 0 are left out.
+    Returns the number of records written.
+    """
+    top = max(weights.values(), default=0)
+    scale = WEIGHT_MAX / top if top > WEIGHT_MAX else 1
+    records = []
+    for (key, code), weight in weights.items():
+        weight = int(weight * scale)
+        if weight > 0:
+            records.append((key, -weight, code))
+    records.sort()
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(records), 0))
+        for key, neg_weight, code in records:
+            f.write(RECORD.pack(key, code, -neg_weight))
+    # Workers may have the old book mapped; replace it instead of writing over it
+    os.replace(tmp, path)
+    return len(records)
+
+
+def parse_move(board, name):
+    """The legal move with coordinate name `name` (e.g. 'e2e4'), or None."""
+    for move in board.legal_moves():
+        if move_name(move) == name:
+            return move
+    return None
+
+
+def book_from_games(paths, max_plies=16, min_games=1):
+    """
+    {(key, move code): weight} from games in JSON-lines files with 'opening'
+    (a FEN), 'moves' (coordinate notation) and 'result' fields. A move scores
+    2 for each game its side went on to win and 1 for each draw; only the
+    first max_plies moves of each game are used.
+    """
+    score = {}
+    games = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                board = Board.from_fen(record.get('opening') or FEN_START)
+                result = record.get('result')
+                for name in record.get('moves', [])[:max_plies]:
+                    move = parse_move(board, name)
+                    if move is None:
+                        # A forfeited turn ('0000') or a game from different rules
+                        break
+                    entry = (board.zobrist, encode_move(move))
+                    if result == '1/2-1/2':
+                        points = 1
+                    else:
+                        points = 2 if (result == '1-0') == (board.turn == 'w') else 0
+                    score[entry] = score.get(entry, 0) + points
+                    games[entry] = games.get(entry, 0) + 1
+                    board.make(move)
+    return {entry: w for entry, w in score.items() if games[entry] >= min_games}
+
+
+def book_from_search(fens=(FEN_START,), plies=4, depth=4, width=2, margin=30, out=print):
+    """
+    {(key, move code): weight} from searching the opening tree: at each
+    position every legal move is searched to depth - 1, and the best `width`
+    moves within `margin` centipawns of the best get weights by score. The
+    tree follows the book moves of both sides for `plies` plies.
+    """
+    from .ai import ai
+    engine = ai.Engine()
+    weights = {}
+    seen = set()
+
+    def expand(board, plies_left):
+        if plies_left == 0 or board.zobrist in seen or board.outcome():
+            return
+        seen.add(board.zobrist)
+        sign = 1 if board.turn == 'w' else -1
+        scored = []
+        for move in board.legal_moves():
+            board.make(move)
+            if board.outcome():
+                value = ai.evaluate(board)
+            else:
+                ai.choose_alphabeta_move(board, max(1, depth - 1), engine=engine)
+                value = engine.score
+            board.unmake()
+            scored.append((sign * value, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best = scored[0][0]
+        for value, move in scored[:width]:
+            if value < best - margin:
+                break
+            weights[(board.zobrist, encode_move(move))] = max(1, margin + 1 - (best - value))
+            board.make(move)
+            expand(board, plies_left - 1)
+            board.unmake()
+
+    for fen in fens:
+        expand(Board.from_fen(fen), plies)
+        out(f"{fen}: {len(weights)} book moves so far")
+    return weights
+
+
+def build_book(path, games=None, plies=None, depth=4, width=2, out=print):
+    """
+    Build the book file at path from game files (a list of paths), using each
+    game's first `plies` moves (default 16), or without them by searching
+    the tree `plies` deep (default 6).
+    """
+    if games:
+        weights = book_from_games(games, max_plies=plies or 16)
+    else:
+        weights = book_from_search(plies=plies or 6, depth=depth, width=width, out=out)
+    count = write_book(path, weights)
+    positions = len({key for (key, _), weight in weights.items() if weight > 0})
+    out(f"Wrote {count} moves for {positions} positions to {path}")
+    return count
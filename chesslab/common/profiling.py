@@ -13,3 +13,34 @@ class Counter:
     def __init__(self): self.counts={}
     def inc(self, key, by=1): self.counts[key]=self.counts.get(key,0)+by
     def get(self, key): return self.counts.get(key,0)
+def timed(func, store, name):
+    """func wrapped to add its run time (ms) to store[name]; swap it in only while profiling."""
+    clock=time.perf_counter
+    def wrapper(*args):
+        t0=clock(); r=func(*args); store[name]=store.get(name,0.0)+(clock()-t0)*1000.0; return r
+    return wrapper
+def timed_iter(func, store, name):
+    """Like timed() for a generator function: times each step, not the consumer's work between steps."""
+    clock=time.perf_counter
+    def wrapper(*args):
+        it=func(*args)
+        while True:
+            t0=clock()
+            try: item=next(it)
+            except StopIteration: store[name]=store.get(name,0.0)+(clock()-t0)*1000.0; return
+            store[name]=store.get(name,0.0)+(clock()-t0)*1000.0
+            yield item
+    return wrapper
+def format_search_metrics(m):
+    """One-line summary of the counters a search wrote into its metrics dict ('' if there are none)."""
+    parts=['book'] if m.get('book') else []
+    if m.get('tablebase'): parts.append(f"tablebase dtm={m['dtm']:+d}")
+    if 'depth' in m: parts.append(f"depth={m['depth']}")
+    if 'nodes' in m: parts.append(f"nodes={m['nodes']}")
+    if m.get('qnodes'): parts.append(f"qnodes={m['qnodes']}")
+    if m.get('tt_probes'): parts.append(f"tt={m.get('tt_hits',0)/m['tt_probes']:.0%}")
+    if m.get('tb_hits'): parts.append(f"tb_hits={m['tb_hits']}")
+    if m.get('cutoffs'): parts.append(f"cutoffs={m['cutoffs']} first={m.get('first_move_cutoffs',0)/m['cutoffs']:.0%}")
+    if 'movegen_ms' in m: parts.append(f"movegen={m['movegen_ms']:.0f}ms")
+    if 'eval_ms' in m: parts.append(f"eval={m['eval_ms']:.0f}ms")
+    return ' '.join(parts)
@@ -1,14 +1,14 @@
 
 import tkinter as tk
 from tkinter import ttk
-import time
 import inspect
 import importlib.util
 import os
 from .board import Board, WHITE, BLACK
 from .ai import random_agent, minimax_ai, alphabeta_ai, ai
 from .mode import is_ai_turn, is_human_turn
-from .common.profiling import Timer
+from .common.profiling import Timer, format_search_metrics
+from .worker import EngineWorker
 
 UNICODE={'wK':'\u2654','wQ':'\u2655','wR':'\u2656','wB':'\u2657','wN':'\u2658','wP':'\u2659',
          'bK':'\u265A','bQ':'\u265B','bR':'\u265C','bB':'\u265D','bN':'\u265E','bP':'\u265F'}
@@ -48,137 +48,6 @@ def get_ai_function(module):
     return None, None
 
 
-def _run_generator_in_process(ai_func, board, result_queue):
-    """Worker function for generator AI - runs in separate process."""
-    try:
-        gen = ai_func(board)
-        for move in gen:
-            if move is not None:
-                # Convert move to serializable format
-                result_queue.put(('move', (move.src, move.dst, getattr(move, 'promotion', None))))
-        result_queue.put(('done', None))
-    except Exception as e:
-        result_queue.put(('error', f"{type(e).__name__}: {str(e)}"))
-
-
-def _run_function_in_process(ai_func, board, result_queue, kwargs):
-    """Worker function for regular AI - runs in separate process."""
-    try:
-        ret = ai_func(board, **kwargs)
-        if isinstance(ret, tuple):
-            move = ret[0]
-        else:
-            move = ret
-        if move is not None:
-            result_queue.put(('result', (move.src, move.dst, getattr(move, 'promotion', None))))
-        else:
-            result_queue.put(('result', None))
-    except Exception as e:
-        result_queue.put(('error', f"{type(e).__name__}: {str(e)}"))
-
-
-def run_generator_with_timeout(ai_func, board, timeout):
-    """
-    Run a generator AI with timeout using multiprocessing.
-    Returns (move, moves_yielded, elapsed, completed, error).
-    """
-    import multiprocessing
-    from .board import Move
-
-    result_queue = multiprocessing.Queue()
-    process = multiprocessing.Process(
-        target=_run_generator_in_process,
-        args=(ai_func, board, result_queue)
-    )
-
-    start_time = time.time()
-    process.start()
-
-    last_move = None
-    moves_yielded = 0
-    error = None
-    completed = False
-
-    deadline = start_time + timeout
-    while True:
-        remaining = deadline - time.time()
-        if remaining <= 0:
-            break
-        try:
-            msg_type, value = result_queue.get(timeout=min(0.1, remaining))
-            if msg_type == 'move':
-                src, dst, promotion = value
-                last_move = Move(src, dst, promotion)
-                moves_yielded += 1
-            elif msg_type == 'done':
-                completed = True
-                break
-            elif msg_type == 'error':
-                error = value
-                break
-        except:
-            if not process.is_alive():
-                break
-
-    elapsed = time.time() - start_time
-
-    if process.is_alive():
-        process.terminate()
-        process.join(timeout=0.5)
-        if process.is_alive():
-            process.kill()
-
-    return last_move, moves_yielded, elapsed, completed, error
-
-
-def run_function_with_timeout(ai_func, board, timeout, **kwargs):
-    """
-    Run a function AI with timeout using multiprocessing.
-    Returns (move, elapsed, completed, error).
-    """
-    import multiprocessing
-    from .board import Move
-
-    result_queue = multiprocessing.Queue()
-    process = multiprocessing.Process(
-        target=_run_function_in_process,
-        args=(ai_func, board, result_queue, kwargs)
-    )
-
-    start_time = time.time()
-    process.start()
-    process.join(timeout=timeout)
-    elapsed = time.time() - start_time
-
-    move = None
-    error = None
-    completed = False
-
-    if process.is_alive():
-        process.terminate()
-        process.join(timeout=0.5)
-        if process.is_alive():
-            process.kill()
-        return None, elapsed, False, "Timeout"
-
-    # Process finished, get result
-    try:
-        if not result_queue.empty():
-            msg_type, value = result_queue.get_nowait()
-            if msg_type == 'result':
-                if value is not None:
-                    src, dst, promotion = value
-                    move = Move(src, dst, promotion)
-                completed = True
-            elif msg_type == 'error':
-                error = value
-                completed = True
-    except:
-        pass
-
-    return move, elapsed, completed, error
-
-
 class App:
     def __init__(self, root, white_ai_path=None, black_ai_path=None, time_limit=None):
         self.root=root; self.root.title('ChessLab')
@@ -202,6 +71,10 @@ class App:
         self.black_ai_func = None
         self.white_ai_type = None
         self.black_ai_type = None
+        self.white_ai_path = white_ai_path
+        self.black_ai_path = black_ai_path
+        # One warm AI process per side, kept across moves and games
+        self.workers = {}
 
         # Load custom AI files if provided
         if white_ai_path or black_ai_path:
@@ -222,6 +95,15 @@ class App:
         # Check default ai.py for choose_move
         self.default_ai_func, self.default_ai_type = get_ai_function(ai)
 
+        # Pre-warm the custom AIs so their first move is not charged for startup
+        for color, func in ((WHITE, self.white_ai_func), (BLACK, self.black_ai_func)):
+            if func:
+                try:
+                    self.worker_for(color, func)
+                except Exception as e:
+                    self.info.set(f"AI worker error: {e}")
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+
         top=ttk.Frame(root, padding=6); top.pack(fill='x')
         ttk.Button(top,text='New',command=self.new).pack(side='left',padx=4)
         self.start_btn=ttk.Button(top,text='Start',command=self.toggle_start); self.start_btn.pack(side='left',padx=4)
@@ -247,6 +129,23 @@ class App:
         self.start_btn.configure(text='Start')
         self.draw()
 
+    def worker_for(self, color, func):
+        """The worker process for this side, replaced only when the side's AI function changes."""
+        if func is self.white_ai_func: path = self.white_ai_path
+        elif func is self.black_ai_func: path = self.black_ai_path
+        else: path = None
+        worker = self.workers.get(color)
+        if worker is None or (worker.path, worker.module_name, worker.func_name) != (path, func.__module__, func.__name__):
+            if worker is not None: worker.close()
+            worker = self.workers[color] = EngineWorker(func, path).start()
+        return worker
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
+        self.workers.clear()
+        self.root.destroy()
+
     def draw(self):
         self.canvas.delete('all')
         for r in range(8):
@@ -384,41 +283,41 @@ class App:
                 ai_type_used = ai_type
                 with Timer('ai_ms', metrics):
                     if ai_type == 'IDS':
-                        move, moves_yielded, elapsed, completed, error = run_generator_with_timeout(ai_func, self.board, timeout)
+                        move, moves_yielded, elapsed, completed, error = self.worker_for(current_color, ai_func).run_generator(self.board, timeout, metrics=metrics)
                         metrics['moves_yielded'] = moves_yielded
                         if move is None and not completed:
                             forfeit = True
                     elif ai_type in ('AlphaBeta', 'Minimax'):
-                        move, elapsed, completed, error = run_function_with_timeout(
-                            ai_func, self.board.clone(), timeout, depth=depth, metrics=metrics
+                        move, elapsed, completed, error = self.worker_for(current_color, ai_func).run_function(
+                            self.board, timeout, depth=depth, metrics=metrics
                         )
                         if isinstance(move, tuple):
                             move = move[0]
                         if move is None and not completed:
                             forfeit = True
                     elif ai_type == 'Function':
-                        move, elapsed, completed, error = run_function_with_timeout(
-                            ai_func, self.board.clone(), timeout
+                        move, elapsed, completed, error = self.worker_for(current_color, ai_func).run_function(
+                            self.board, timeout
                         )
                         if move is None and not completed:
                             forfeit = True
                     else:  # Random
-                        move, elapsed, completed, error = run_function_with_timeout(
-                            ai_func, self.board.clone(), timeout
+                        move, elapsed, completed, error = self.worker_for(current_color, ai_func).run_function(
+                            self.board, timeout
                         )
             else:
                 # Use dropdown selection (legacy behavior) with timeout
                 with Timer('ai_ms', metrics):
                     try:
                         if algo=='Random':
-                            move, elapsed, completed, error = run_function_with_timeout(
-                                random_agent.choose_move, self.board.clone(), timeout
+                            move, elapsed, completed, error = self.worker_for(current_color, random_agent.choose_move).run_function(
+                                self.board, timeout
                             )
                             if move is None and not completed:
                                 forfeit = True
                         elif algo=='Minimax':
-                            move, elapsed, completed, error = run_function_with_timeout(
-                                minimax_ai.choose_move, self.board.clone(), timeout, depth=depth, metrics=metrics
+                            move, elapsed, completed, error = self.worker_for(current_color, minimax_ai.choose_move).run_function(
+                                self.board, timeout, depth=depth, metrics=metrics
                             )
                             if isinstance(move, tuple):
                                 metrics['nodes'] = move[1] if len(move) > 1 else 0
@@ -426,8 +325,8 @@ class App:
                             if move is None and not completed:
                                 forfeit = True
                         else:
-                            move, elapsed, completed, error = run_function_with_timeout(
-                                alphabeta_ai.choose_move, self.board.clone(), timeout, depth=depth, metrics=metrics
+                            move, elapsed, completed, error = self.worker_for(current_color, alphabeta_ai.choose_move).run_function(
+                                self.board, timeout, depth=depth, metrics=metrics
                             )
                             if isinstance(move, tuple):
                                 metrics['nodes'] = move[1] if len(move) > 1 else 0
@@ -440,7 +339,7 @@ class App:
 
             if forfeit:
                 # Forfeit the move (skip turn), not the game
-                self.board.turn = self.board.enemy(self.board.turn)
+                self.board.make_null()
                 self.status.set(f'{color_name} forfeits move (timeout). ' + ('White' if self.board.turn=='w' else 'Black') + ' to move.')
                 self.info.set(f"{color_name} AI ({ai_type_used}) timed out - move forfeited")
                 self.after_move()
@@ -454,13 +353,14 @@ class App:
                 if 'moves_yielded' in metrics:
                     info_str += f" yields={metrics['moves_yielded']}"
                 info_str += f" time={metrics.get('ai_ms',0):.1f}ms"
-                if 'nodes' in metrics:
-                    info_str += f" nodes={metrics['nodes']}"
+                stats = format_search_metrics(metrics)
+                if stats:
+                    info_str += f" {stats}"
                 self.info.set(info_str)
                 self.after_move()
             else:
                 # No move returned - forfeit the move (skip turn)
-                self.board.turn = self.board.enemy(self.board.turn)
+                self.board.make_null()
                 self.info.set(f"{color_name} AI ({ai_type_used}) returned no move - move forfeited")
                 self.after_move()
         finally:
@@ -0,0 +1,118 @@
+"""
+perft: count the leaf nodes of the legal move tree to a fixed depth.
+
+Comparing the counts against known-good numbers is the standard check that
+move generation is correct, and the time it takes is a clean measure of
+generator speed (no evaluation or search logic involved). `divide` breaks
+the count down by root move, which narrows a mismatch to one subtree.
+
+The reference counts below follow ChessLab's rules (no castling, no en
+passant, promotion to a queen only), so they differ from the usual
+published perft numbers once those moves appear.
+
+    python main.py --perft 4
+    python main.py --perft 3 --divide --fen "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w"
+    python main.py --perft-verify
+"""
+import time
+
+from .board import Board, FEN_START, move_name
+from .rootsplit import split_paths, run_split
+
+# Leaf counts for depth 1, 2, ... under ChessLab's rules
+REFERENCE = {
+    FEN_START: [20, 400, 8902, 197281, 4865351],
+    # Kiwipete; its castling and en passant moves do not exist here
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w - - 0 1": [46, 1865, 86585, 3488552],
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1": [14, 191, 2810, 43087, 671300],
+    # Promotions with captures, pins and discovered checks
+    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b - - 0 1": [6, 222, 7855, 305965],
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w - - 0 1": [40, 1339, 51750, 1729274],
+}
+
+
+def perft(board, depth):
+    """Number of leaf nodes depth plies below board (board is restored afterwards)."""
+    if depth == 0:
+        return 1
+    moves = board.legal_moves()
+    if depth == 1:
+        # Bulk counting: the leaves are the legal moves themselves
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.make(move)
+        nodes += perft(board, depth - 1)
+        board.unmake()
+    return nodes
+
+
+def _perft_task(board, plies, depth):
+    return perft(board, depth - plies)
+
+
+def divide(board, depth, workers=1):
+    """
+    {move name: leaf count} for every root move. With workers > 1 the
+    subtrees are counted in parallel by a process pool.
+    """
+    if depth < 1:
+        return {}
+    board = board.clone()
+    if workers > 1:
+        paths = split_paths(board, 1, workers)
+        counts = run_split(board, paths, _perft_task, (depth,), workers)
+        return {move_name(path[0]): n for path, n in zip(paths, counts)}
+    counts = {}
+    for move in board.legal_moves():
+        board.make(move)
+        counts[move_name(move)] = perft(board, depth - 1)
+        board.unmake()
+    return counts
+
+
+def parallel_perft(board, depth, workers):
+    """perft with the root (or the first two plies, for narrow roots) split across `workers` processes."""
+    if depth < 2 or workers <= 1:
+        return perft(board.clone(), depth)
+    board = board.clone()
+    paths = split_paths(board, depth, workers * 4)
+    # A path that ended early (no replies) is a mate or stalemate: no leaves below it
+    return sum(run_split(board, paths, _perft_task, (depth,), workers))
+
+
+def run_perft(fen=FEN_START, depth=4, divide_moves=False, workers=1, backend='mailbox', out=print):
+    """Print perft (or divide) for fen with wall time and nodes per second; returns the leaf count."""
+    board = Board.from_fen(fen, backend)
+    start = time.perf_counter()
+    if divide_moves:
+        counts = divide(board, depth, workers)
+        for name in sorted(counts):
+            out(f"{name}: {counts[name]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = parallel_perft(board, depth, workers)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+    out(f"perft({depth}) = {nodes}  {elapsed:.2f}s  {nps:,.0f} nps  [{backend}, {workers} worker(s)]")
+    expected = REFERENCE.get(fen if len(fen.split()) > 2 else fen + ' - - 0 1')
+    if expected and depth <= len(expected) and expected[depth - 1] != nodes:
+        out(f"MISMATCH: expected {expected[depth - 1]}")
+    return nodes
+
+
+def verify(max_nodes=2_000_000, workers=1, backend='mailbox', out=print):
+    """Check every reference count up to max_nodes leaves; returns True if all match."""
+    ok = True
+    for fen, counts in REFERENCE.items():
+        board = Board.from_fen(fen, backend)
+        for depth, expected in enumerate(counts, 1):
+            if expected > max_nodes:
+                break
+            start = time.perf_counter()
+            nodes = parallel_perft(board, depth, workers)
+            elapsed = time.perf_counter() - start
+            status = 'ok' if nodes == expected else f'FAIL (expected {expected})'
+            out(f"{fen.split()[0]:<66} d={depth} {nodes:>9} {elapsed:7.2f}s  {status}")
+            ok &= nodes == expected
+    return ok
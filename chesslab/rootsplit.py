@@ -0,0 +1,109 @@
+"""
+Process-parallel root splitting for exhaustive searches.
+
+Every root subtree of a full-width search (perft, minimax) is independent,
+so the subtrees can be searched by separate processes and the results
+combined afterwards. The subtrees are posted to one shared task queue
+(Pool.imap_unordered with chunksize=1) that idle processes pull from, so a
+process that finishes a small subtree takes the next one instead of waiting
+for the others. When there are too few root moves to keep every process busy,
+the split goes one ply deeper and the tasks are (move, reply) pairs.
+
+The pool is started on first use and kept for later calls with the same
+number of workers, so a game of parallel searches pays the process start-up
+once. It is shut down when the process exits, or earlier by close_pool().
+
+    paths = split_paths(board, depth, workers * 4)
+    counts = run_split(board, paths, task, (depth,), workers)
+"""
+
+from __future__ import annotations
+
+import os
+import multiprocessing
+from multiprocessing.util import Finalize
+
+from .board import Board, Move
+
+# (pool, workers, pid of the process that started it), or None
+_pool = None
+_finalize_pid = None
+
+
+def split_paths(board, depth, min_tasks):
+    """
+    Move paths to hand out as tasks for a search of depth plies: the root moves,
+    or (move, reply) pairs when there are fewer than min_tasks root moves and
+    depth >= 2. A root move whose position has no replies stays a path of one move.
+    """
+    paths = [(move,) for move in board.legal_moves()]
+    if len(paths) >= min_tasks or depth < 2:
+        return paths
+    pairs = []
+    for (move,) in paths:
+        board.make(move)
+        replies = board.legal_moves()
+        board.unmake()
+        if replies:
+            pairs.extend((move, reply) for reply in replies)
+        else:
+            pairs.append((move,))
+    return pairs
+
+
+def run_split(board, paths, task, args, workers):
+    """
+    Run task(board_after_path, len(path), *args) for every path in a pool of
+    `workers` processes; returns the results in the order of paths.
+    """
+    fen, backend = board.fen(), board.backend
+    jobs = [(i, fen, backend, [tuple(m) for m in path], task, args) for i, path in enumerate(paths)]
+    results = [None] * len(paths)
+    pool = _get_pool(workers)
+    try:
+        for i, result in pool.imap_unordered(_run_path, jobs, chunksize=1):
+            results[i] = result
+    except BaseException:
+        # Tasks may still be queued; do not leave them in front of the next call
+        close_pool(terminate=True)
+        raise
+    return results
+
+
+def _get_pool(workers):
+    global _pool, _finalize_pid
+    pid = os.getpid()
+    if _pool is not None and _pool[2] != pid:
+        # Inherited through fork: the pool belongs to the parent
+        _pool = None
+    if _pool is not None and _pool[1] != workers:
+        close_pool()
+    if _pool is None:
+        _pool = (multiprocessing.Pool(workers), workers, pid)
+        if _finalize_pid != pid:
+            # Also runs when a worker process exits, where atexit handlers do not;
+            # ahead of the Pool's own finalizer, which would terminate it
+            Finalize(None, close_pool, exitpriority=20)
+            _finalize_pid = pid
+    return _pool[0]
+
+
+def close_pool(terminate=False):
+    """Shut down the shared pool, if this process started one."""
+    global _pool
+    if _pool is not None and _pool[2] == os.getpid():
+        pool = _pool[0]
+        if terminate:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+    _pool = None
+
+
+def _run_path(job):
+    i, fen, backend, path, task, args = job
+    board = Board.from_fen(fen, backend)
+    for move in path:
+        board.make(Move(*move))
+    return i, task(board, len(path), *args)
@@ -0,0 +1,601 @@
+"""
+Endgame tablebases: exact distance-to-mate for small piece sets.
+
+A table covers one piece set, named by the pieces of each side with the
+stronger side first ('KQvK', 'KRvK', 'KPvK', 'KBNvK', 'KQvKR', ...), and
+stores one byte per position:
+
+    0        draw (or a position that cannot occur)
+    n + 1    mate n plies away with best play: the side to move mates
+             when n is odd and is mated when n is even (0 = checkmated now)
+
+Tables are built by retrograde analysis under ChessLab's rules (promotion to
+a queen only, no castling, no en passant): every checkmate is found first,
+then positions are resolved backwards one ply at a time by un-making moves.
+Captures and promotions leave the table, so their values come from the
+smaller tables (KPvK needs KQvK), which are built first. Without pawns the
+white king is folded into the a1-d1-d4 triangle (8-fold symmetry), with
+pawns only the left-right mirror applies.
+
+File layout, little-endian: MAGIC (8 bytes), table name (16 bytes, NUL
+padded), position count (uint32), 4 reserved bytes, then the value bytes.
+The files are read through mmap, so a probe reads one byte in place.
+
+    python main.py --build-tablebases chesslab/ai/tablebases
+    python main.py --build-tablebases tb --tablebase-sets KQvK KRvK KQvKR
+    python main.py --tablebases tb --white chesslab/ai/ai.py ...
+"""
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'CLTB1\x00\x00\x00'
+HEADER = struct.Struct('<8s16sI4x')
+
+# Built by default; each 4-piece set (5.2M positions) takes about a quarter of an hour
+DEFAULT_SETS = ('KQvK', 'KRvK', 'KPvK', 'KBNvK')
+
+PIECE_ORDER = 'KQRBNP'
+PIECE_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+WHITE, BLACK = 0, 1
+
+
+def _rc(s):
+    return s >> 3, s & 7
+
+
+def _steps(deltas):
+    table = []
+    for s in range(64):
+        r, c = _rc(s)
+        table.append([(r + dr) * 8 + c + dc for dr, dc in deltas if 0 <= r + dr < 8 and 0 <= c + dc < 8])
+    return table
+
+
+KING_STEPS = _steps([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+KNIGHT_STEPS = _steps([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_SETS = [frozenset(t) for t in KING_STEPS]
+KNIGHT_SETS = [frozenset(t) for t in KNIGHT_STEPS]
+# Squares a pawn of each colour attacks; white moves towards row 0
+PAWN_ATTACKS = (_steps([(-1, -1), (-1, 1)]), _steps([(1, -1), (1, 1)]))
+PAWN_ATTACKS = tuple([frozenset(t) for t in side] for side in PAWN_ATTACKS)
+
+ROOK_DIRS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def _rays(dirs):
+    table = []
+    for s in range(64):
+        r, c = _rc(s)
+        rays = []
+        for dr, dc in dirs:
+            ray, rr, cc = [], r + dr, c + dc
+            while 0 <= rr < 8 and 0 <= cc < 8:
+                ray.append(rr * 8 + cc)
+                rr, cc = rr + dr, cc + dc
+            rays.append(ray)
+        table.append(rays)
+    return table
+
+
+RAYS = {'R': _rays(ROOK_DIRS), 'B': _rays(BISHOP_DIRS)}
+RAYS['Q'] = [r + b for r, b in zip(RAYS['R'], RAYS['B'])]
+
+# LINE[a * 64 + b]: 'R' or 'B' if a slider of that kind on a sees b along an
+# empty line, else None; BETWEEN[a * 64 + b]: the squares in between
+LINE = [None] * 4096
+BETWEEN = [()] * 4096
+for _kind in 'RB':
+    for _a in range(64):
+        for _ray in RAYS[_kind][_a]:
+            for _i, _b in enumerate(_ray):
+                LINE[_a * 64 + _b] = _kind
+                BETWEEN[_a * 64 + _b] = tuple(_ray[:_i])
+
+
+def _transforms():
+    maps = []
+    for transpose in (False, True):
+        for flip_r in (False, True):
+            for flip_c in (False, True):
+                m = []
+                for s in range(64):
+                    r, c = _rc(s)
+                    if transpose:
+                        r, c = c, r
+                    if flip_r:
+                        r = 7 - r
+                    if flip_c:
+                        c = 7 - c
+                    m.append(r * 8 + c)
+                maps.append(m)
+    return maps
+
+
+# The 8 symmetries of the board (the identity first) and the left-right mirror
+TRANSFORMS = _transforms()
+MIRROR = [s ^ 7 for s in range(64)]
+# Without pawns the white king is kept on a1-d1-d4 (rank <= file <= d)
+TRIANGLE = [s for s in range(64) if 7 - (s >> 3) <= (s & 7) <= 3]
+TRIANGLE_INDEX = {s: i for i, s in enumerate(TRIANGLE)}
+TRIANGLE_MAPS = [[m for m in TRANSFORMS if m[s] in TRIANGLE_INDEX] for s in range(64)]
+# With pawns it is kept on files a-d
+HALF = [s for s in range(64) if (s & 7) <= 3]
+HALF_INDEX = {s: i for i, s in enumerate(HALF)}
+
+
+def split_name(name):
+    """'KBNvK' -> ('KBN', 'K')."""
+    white, black = name.split('v')
+    return white, black
+
+
+def _side_name(kinds):
+    return ''.join(sorted(kinds, key=PIECE_ORDER.index))
+
+
+def canonical_name(white, black):
+    """
+    (table name, flipped) for a position with these pieces per side: the
+    table has the stronger side as White, so flipped means the colours of
+    the position have to be swapped to look it up.
+    """
+    white, black = _side_name(white), _side_name(black)
+
+    def strength(side):
+        return sum(PIECE_VALUES[k] for k in side), len(side), [-PIECE_ORDER.index(k) for k in side]
+
+    if strength(black) > strength(white):
+        return f"{black}v{white}", True
+    return f"{white}v{black}", False
+
+
+def is_drawn(name):
+    """Piece sets where no mate is possible at all: KvK, KBvK, KNvK."""
+    white, black = split_name(name)
+    rest = white[1:] + black[1:]
+    return len(rest) <= 1 and all(k in 'BN' for k in rest)
+
+
+def table_pieces(name):
+    """[(colour, kind)] in a table's index order: each side's king, then its other pieces."""
+    white, black = split_name(name)
+    return [(WHITE, k) for k in white] + [(BLACK, k) for k in black]
+
+
+def _attacked(target, attackers, squares, occupied, skip=-1):
+    """
+    Is square target attacked by one of attackers, [(piece index, colour,
+    kind)] of one side (ignoring piece `skip`, just captured)? occupied is
+    the set of occupied squares.
+    """
+    for i, color, kind in attackers:
+        if i == skip:
+            continue
+        s = squares[i]
+        if kind == 'K':
+            hit = target in KING_SETS[s]
+        elif kind == 'N':
+            hit = target in KNIGHT_SETS[s]
+        elif kind == 'P':
+            hit = target in PAWN_ATTACKS[color][s]
+        else:
+            line = LINE[s * 64 + target]
+            hit = (line is not None and (kind == 'Q' or kind == line)
+                   and occupied.isdisjoint(BETWEEN[s * 64 + target]))
+        if hit:
+            return True
+    return False
+
+
+class Table:
+    """
+    One piece set's table over `data` (a bytearray while it is built, an
+    mmap once loaded). Positions are (squares, stm): the square (row * 8 +
+    col, row 0 = rank 8) of each piece in table_pieces() order, and the side
+    to move (WHITE or BLACK).
+    """
+
+    def __init__(self, name, data=None):
+        self.name = name
+        self.pieces = table_pieces(name)
+        self.kings = (0, len(split_name(name)[0]))
+        self.pawns = any(kind == 'P' for _, kind in self.pieces)
+        # Each side's pieces as (index, colour, kind), for attack tests
+        self.sides = tuple([(i, c, k) for i, (c, k) in enumerate(self.pieces) if c == color]
+                           for color in (WHITE, BLACK))
+        king_squares = len(HALF) if self.pawns else len(TRIANGLE)
+        self.size = king_squares * 64 ** (len(self.pieces) - 1) * 2
+        self.data = data
+
+    def index(self, squares, stm):
+        """Position index; all symmetric positions share the smallest one."""
+        if self.pawns:
+            if squares[0] & 7 > 3:
+                squares = [MIRROR[s] for s in squares]
+            idx = HALF_INDEX[squares[0]]
+            for s in squares[1:]:
+                idx = idx * 64 + s
+            return idx * 2 + stm
+        best = None
+        for m in TRIANGLE_MAPS[squares[0]]:
+            idx = TRIANGLE_INDEX[m[squares[0]]]
+            for s in squares[1:]:
+                idx = idx * 64 + m[s]
+            if best is None or idx < best:
+                best = idx
+        return best * 2 + stm
+
+    def decode(self, idx):
+        """(squares, stm) for an index."""
+        stm = idx & 1
+        idx >>= 1
+        rest = []
+        for _ in range(len(self.pieces) - 1):
+            rest.append(idx & 63)
+            idx >>= 6
+        king = HALF[idx] if self.pawns else TRIANGLE[idx]
+        return [king] + rest[::-1], stm
+
+    def legal(self, squares, stm):
+        """Can the position occur: no two pieces on a square, no pawn on a back rank, and the side not to move not in check."""
+        if len(set(squares)) != len(squares):
+            return False
+        for (_, kind), s in zip(self.pieces, squares):
+            if kind == 'P' and (s >> 3) in (0, 7):
+                return False
+        return not _attacked(squares[self.kings[1 - stm]], self.sides[stm], squares, set(squares))
+
+    def in_check(self, squares, stm):
+        return _attacked(squares[self.kings[stm]], self.sides[1 - stm], squares, set(squares))
+
+    def moves(self, squares, stm):
+        """Yield (piece index, to square, captured piece index or -1) for each legal move."""
+        pieces = self.pieces
+        occupant = {s: i for i, s in enumerate(squares)}
+        attackers = self.sides[1 - stm]
+        king = squares[self.kings[stm]]
+        checked = _attacked(king, attackers, squares, set(squares))
+        for i, color, kind in self.sides[stm]:
+            s = squares[i]
+            # Out of check, only a king move or a piece on a line from the king can expose it
+            verify = checked or kind == 'K' or LINE[king * 64 + s] is not None
+            if kind == 'P':
+                step = -8 if color == WHITE else 8
+                targets = []
+                if s + step not in occupant:
+                    targets.append(s + step)
+                    start = 6 if color == WHITE else 1
+                    if s >> 3 == start and s + 2 * step not in occupant:
+                        targets.append(s + 2 * step)
+                targets += [t for t in PAWN_ATTACKS[color][s] if t in occupant]
+            elif kind == 'K':
+                targets = KING_STEPS[s]
+            elif kind == 'N':
+                targets = KNIGHT_STEPS[s]
+            else:
+                targets = []
+                for ray in RAYS[kind][s]:
+                    for t in ray:
+                        targets.append(t)
+                        if t in occupant:
+                            break
+            for t in targets:
+                j = occupant.get(t, -1)
+                if j >= 0 and (pieces[j][0] == stm or pieces[j][1] == 'K'):
+                    continue
+                if verify:
+                    new = list(squares)
+                    new[i] = t
+                    if _attacked(new[self.kings[stm]], attackers, new, set(new), skip=j):
+                        continue
+                yield i, t, j
+
+    def predecessors(self, squares, stm):
+        """Yield the index of every position that reaches this one by a move that stays in the table."""
+        mover = 1 - stm
+        attackers = self.sides[mover]
+        occupied = set(squares)
+        for i, color, kind in attackers:
+            s = squares[i]
+            if kind == 'P':
+                # Un-push: white pawns came from the row below (higher row number)
+                back = s + 8 if color == WHITE else s - 8
+                start = 6 if color == WHITE else 1
+                origins = []
+                if back not in occupied and 0 < back >> 3 < 7:
+                    origins.append(back)
+                    if back >> 3 != start and (back + back - s) >> 3 == start and back + back - s not in occupied:
+                        origins.append(back + back - s)
+            elif kind == 'K':
+                origins = [t for t in KING_STEPS[s] if t not in occupied]
+            elif kind == 'N':
+                origins = [t for t in KNIGHT_STEPS[s] if t not in occupied]
+            else:
+                origins = []
+                for ray in RAYS[kind][s]:
+                    for t in ray:
+                        if t in occupied:
+                            break
+                        origins.append(t)
+            for t in origins:
+                new = list(squares)
+                new[i] = t
+                # Before the move it was the mover's turn: the other king must not be in check
+                if not _attacked(new[self.kings[stm]], attackers, new, set(new)):
+                    yield self.index(new, mover)
+
+    def value(self, squares, stm):
+        return self.data[HEADER.size + self.index(squares, stm)]
+
+
+class Tablebases:
+    """The tables in a directory, each memory-mapped when first needed. Call close() when done."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.tables = {}
+        self._files = []
+        self.names = set()
+        if directory and os.path.isdir(directory):
+            self.names = {f[:-3] for f in os.listdir(directory) if f.endswith('.tb')}
+        self.max_pieces = max((len(name) - 1 for name in self.names), default=0)
+
+    def __bool__(self):
+        return bool(self.names)
+
+    def table(self, name):
+        """The Table for a piece set, or None if there is none."""
+        table = self.tables.get(name)
+        if table is None and name in self.names:
+            path = os.path.join(self.directory, name + '.tb')
+            f = open(path, 'rb')
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, stored, size = HEADER.unpack_from(data, 0)
+            table = Table(name, data)
+            if magic != MAGIC or stored.rstrip(b'\x00').decode() != name or size != table.size:
+                data.close()
+                f.close()
+                raise ValueError(f"{path}: not a ChessLab tablebase for {name}")
+            self._files.append(f)
+            self.tables[name] = table
+        return table
+
+    def add(self, table):
+        """Make a table (e.g. one just built, still in memory) available for lookups."""
+        self.tables[table.name] = table
+        self.names.add(table.name)
+        self.max_pieces = max(self.max_pieces, len(table.pieces))
+
+    def lookup(self, pieces, squares, stm):
+        """
+        The value byte of any position given as pieces [(colour, kind)],
+        their squares and the side to move, or None if no table covers it.
+        """
+        name, flipped = canonical_name([k for c, k in pieces if c == WHITE], [k for c, k in pieces if c == BLACK])
+        if is_drawn(name):
+            return 0
+        table = self.table(name)
+        if table is None:
+            return None
+        buckets = {}
+        for (color, kind), s in zip(pieces, squares):
+            if flipped:
+                # Swap colours and mirror top to bottom, so pawns still run the right way
+                color, s = 1 - color, s ^ 56
+            buckets.setdefault((color, kind), []).append(s)
+        arranged = [buckets[p].pop() for p in table.pieces]
+        return table.value(arranged, 1 - stm if flipped else stm)
+
+    def probe(self, board):
+        """
+        (result, plies) for the side to move on board: result 1 for a win,
+        -1 for a loss and 0 for a draw, plies the distance to mate (0 for a
+        draw). None if no table covers the position.
+        """
+        if board.piece_count() > self.max_pieces:
+            return None
+        pieces, squares = [], []
+        for pc, r, c in board.occupied():
+            pieces.append((WHITE if pc[0] == 'w' else BLACK, pc[1]))
+            squares.append(r * 8 + c)
+        value = self.lookup(pieces, squares, WHITE if board.turn == 'w' else BLACK)
+        if value is None:
+            return None
+        if value == 0:
+            return 0, 0
+        plies = value - 1
+        return (1 if plies % 2 else -1), plies
+
+    def best_move(self, board):
+        """
+        (move, result, plies) with the quickest mate when winning, the
+        longest defence when losing and any drawing move otherwise; None if
+        a position after some move is not covered.
+        """
+        best = None
+        for move in board.legal_moves():
+            board.make(move)
+            child = self.probe(board)
+            board.unmake()
+            if child is None:
+                return None
+            result, plies = child
+            # Rank: mates of the opponent (soonest first), draws, then being mated (latest first)
+            rank = (-result, -plies if result < 0 else plies)
+            if best is None or rank > best[0]:
+                best = (rank, move, -result, plies + 1 if result else 0)
+        return best[1:] if best else None
+
+    def close(self):
+        for table in self.tables.values():
+            if isinstance(table.data, mmap.mmap):
+                table.data.close()
+        for f in self._files:
+            f.close()
+        self.tables.clear()
+        self._files.clear()
+
+
+def dependencies(name):
+    """Tables a table's captures and promotions lead to (drawn piece sets left out)."""
+    pieces = table_pieces(name)
+    found = set()
+    for i, (color, kind) in enumerate(pieces):
+        changed = []
+        if kind != 'K':
+            changed.append(pieces[:i] + pieces[i + 1:])
+        if kind == 'P':
+            changed.append(pieces[:i] + [(color, 'Q')] + pieces[i + 1:])
+        for rest in changed:
+            child, _ = canonical_name([k for c, k in rest if c == WHITE], [k for c, k in rest if c == BLACK])
+            if not is_drawn(child):
+                found.add(child)
+    return found
+
+
+def generate(name, tablebases, out=print):
+    """Build the table for name by retrograde analysis; the tables it depends on must be in tablebases."""
+    start = time.perf_counter()
+    table = Table(name)
+    pieces = table.pieces
+    size = table.size
+    value = bytearray(size)
+    # 1 = resolved (value is final), 2 = draw without moves, illegal, or a symmetric duplicate
+    done = bytearray(size)
+    # plies to mate -> positions to resolve at that distance
+    pending = {}
+
+    def children(squares, stm, indices=True):
+        """
+        Indices of the moves that stay in the table (only their number
+        without indices), and the value bytes of the moves that leave it.
+        """
+        inside, exits = [], []
+        for i, t, j in table.moves(squares, stm):
+            promotes = pieces[i][1] == 'P' and (t >> 3) in (0, 7)
+            if j < 0 and not promotes:
+                if indices:
+                    new = list(squares)
+                    new[i] = t
+                    inside.append(table.index(new, 1 - stm))
+                else:
+                    inside.append(None)
+                continue
+            new = list(squares)
+            new[i] = t
+            rest = list(pieces)
+            if promotes:
+                rest[i] = (pieces[i][0], 'Q')
+            if j >= 0:
+                del rest[j], new[j]
+            found = tablebases.lookup(rest, new, 1 - stm)
+            if found is None:
+                raise LookupError(f"{name} needs the tables {sorted(dependencies(name))}")
+            exits.append(found)
+        return inside, exits
+
+    def losing(idx):
+        """Plies to mate if every move from idx leads to a resolved win for the opponent, else None."""
+        inside, exits = children(*table.decode(idx))
+        longest = 0
+        for child in inside:
+            if done[child] != 1 or value[child] % 2:
+                return None
+            longest = max(longest, value[child] - 1)
+        for found in exits:
+            if not found or found % 2:
+                return None
+            longest = max(longest, found - 1)
+        return longest + 1
+
+    for idx in range(size):
+        squares, stm = table.decode(idx)
+        if not table.legal(squares, stm) or table.index(squares, stm) != idx:
+            done[idx] = 2
+            continue
+        inside, exits = children(squares, stm, indices=False)
+        if not inside and not exits:
+            if table.in_check(squares, stm):
+                pending.setdefault(0, []).append(idx)
+            else:
+                done[idx] = 2
+            continue
+        # Moves out of the table already have values: a capture into a lost
+        # position wins now, and with no moves inside, all losing exits lose
+        wins = [found - 1 for found in exits if found and found % 2]
+        if wins:
+            pending.setdefault(min(wins) + 1, []).append(idx)
+        elif not inside and all(found and not found % 2 for found in exits):
+            pending.setdefault(max(exits), []).append(idx)
+
+    out(f"{name}: {size} positions scanned, {time.perf_counter() - start:.1f}s")
+    plies = 0
+    while pending:
+        for idx in pending.pop(plies, ()):
+            if done[idx]:
+                continue
+            done[idx] = 1
+            value[idx] = plies + 1
+            for prev in table.predecessors(*table.decode(idx)):
+                if done[prev]:
+                    continue
+                if plies % 2 == 0:
+                    # A move into a lost position wins
+                    pending.setdefault(plies + 1, []).append(prev)
+                else:
+                    longest = losing(prev)
+                    if longest is not None:
+                        pending.setdefault(longest, []).append(prev)
+        plies += 1
+
+    table.data = bytes(HEADER.size) + bytes(value)
+    wins = [v - 1 for v in value if v and v % 2 == 0]
+    lost = sum(1 for v in value if v % 2)
+    out(f"{name}: {size} positions, {len(wins)} won / {lost} lost for the side to move, "
+        f"longest mate {max(wins, default=0)} plies, {time.perf_counter() - start:.1f}s")
+    return table
+
+
+def write_table(path, table):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, table.name.encode(), table.size))
+        f.write(memoryview(table.data)[HEADER.size:])
+    # Probing processes may have the old file mapped; replace it instead of writing over it
+    os.replace(tmp, path)
+
+
+def build_tablebases(directory, names=DEFAULT_SETS, out=print):
+    """
+    Build the tables for names in directory, together with the smaller
+    tables they depend on. Tables already in the directory are kept.
+    Returns the names of the tables built.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tablebases = Tablebases(directory)
+    built = []
+
+    def build(name):
+        if name in tablebases.names:
+            return
+        for dep in sorted(dependencies(name), key=len):
+            build(dep)
+        table = generate(name, tablebases, out)
+        write_table(os.path.join(directory, name + '.tb'), table)
+        tablebases.add(table)
+        built.append(name)
+
+    try:
+        for name in names:
+            white, black = split_name(name)
+            canonical, _ = canonical_name(white, black)
+            if is_drawn(canonical):
+                out(f"{name}: no mate is possible, nothing to build")
+                continue
+            build(canonical)
+    finally:
+        tablebases.close()
+    return built
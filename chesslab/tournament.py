@@ -0,0 +1,279 @@
+"""
+Headless multi-core tournament between two AIs.
+
+Engine A and engine B play `pairs` pairs of games. Both games of a pair start
+from the same opening position with the colours swapped, so a lopsided
+opening cancels out. Games run in parallel: each of `concurrency` runner
+processes keeps one warm EngineWorker per engine and plays games from a
+shared queue. Every finished game is appended to a JSON-lines file as it
+arrives; the file doubles as input for the opening book builder.
+
+After each game the running score is reported as an Elo difference (A minus
+B) with a 95% error bar. With `sprt=(elo0, elo1)` a sequential probability
+ratio test stops the match as soon as the result is clear at the given
+alpha/beta error rates.
+
+    python main.py --tournament 100 --white new_ai.py --black chesslab/ai/ai.py --time 0.5
+"""
+import importlib.util
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from .board import Board, FEN_START, move_name
+from .worker import GRACE, EngineWorker
+
+
+def load_engine(path):
+    """(func, ai_type, source path) for an AI file, or the random agent when path is None."""
+    if path is not None:
+        spec = importlib.util.spec_from_file_location(
+            "chesslab.ai.custom_ai",
+            path,
+            submodule_search_locations=[]
+        )
+        module = importlib.util.module_from_spec(spec)
+        module.__package__ = "chesslab.ai"
+        spec.loader.exec_module(module)
+        if hasattr(module, 'choose_move'):
+            kind = 'IDS' if inspect.isgeneratorfunction(module.choose_move) else 'Function'
+            return module.choose_move, kind, path
+        for name, kind in (('choose_alphabeta_move', 'AlphaBeta'), ('choose_minimax_move', 'Minimax'),
+                           ('choose_random_move', 'Random')):
+            if hasattr(module, name):
+                return getattr(module, name), kind, path
+    from .ai import random_agent
+    return random_agent.choose_move, 'Random', None
+
+
+def make_openings(count, plies=4, seed=1):
+    """`count` distinct positions reached by `plies` random moves from the start (seeded)."""
+    rng = random.Random(seed)
+    openings = []
+    seen = set()
+    attempts = 0
+    while len(openings) < count and attempts < count * 100:
+        attempts += 1
+        board = Board()
+        for _ in range(plies):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.make(rng.choice(moves))
+        if board.outcome() or board.zobrist in seen:
+            continue
+        seen.add(board.zobrist)
+        openings.append(board.fen())
+    return openings or [FEN_START]
+
+
+def play_game(workers, types, fen, time_limit, max_moves, backend='mailbox', stop=None):
+    """
+    Play one game from fen; workers/types map 'w'/'b' to an EngineWorker and
+    its AI type. Returns {'result', 'reason', 'plies', 'moves'}, or None if
+    the stop event is set before the game ends.
+    """
+    board = Board.from_fen(fen, backend)
+    moves = []
+    ply = 0
+    result, reason = '1/2-1/2', 'move limit'
+    while ply < max_moves:
+        if stop is not None and stop.is_set():
+            return None
+        outcome = board.outcome()
+        if outcome:
+            kind, winner = outcome
+            if kind == 'checkmate':
+                result, reason = ('1-0' if winner == 'w' else '0-1'), 'checkmate'
+            else:
+                result, reason = '1/2-1/2', 'stalemate'
+            break
+        color = board.turn
+        worker, ai_type = workers[color], types[color]
+        if ai_type == 'IDS':
+            move, _, _, completed, error = worker.run_generator(board, time_limit)
+        elif ai_type in ('AlphaBeta', 'Minimax'):
+            move, _, completed, error = worker.run_function(board, time_limit, depth=3, metrics={})
+        else:
+            move, _, completed, error = worker.run_function(board, time_limit)
+        if move is None and not completed:
+            # Forfeit the move (skip turn), not the game
+            board.make_null()
+            moves.append('0000')
+            ply += 1
+            continue
+        if move is None:
+            result = '0-1' if color == 'w' else '1-0'
+            reason = error or 'no move'
+            break
+        board.make(move)
+        moves.append(move_name(move))
+        ply += 1
+    return {'result': result, 'reason': reason, 'plies': ply, 'moves': moves}
+
+
+def _runner(paths, games, results, stop, time_limit, max_moves, backend):
+    """Runner process: play games from the queue until a None arrives or stop is set."""
+    engines = {}
+    workers = {}
+    try:
+        for name, path in paths.items():
+            func, kind, source = load_engine(path)
+            engines[name] = kind
+            workers[name] = EngineWorker(func, source).start()
+        while not stop.is_set():
+            spec = games.get()
+            if spec is None:
+                break
+            index, fen, white = spec
+            black = 'B' if white == 'A' else 'A'
+            record = play_game({'w': workers[white], 'b': workers[black]},
+                               {'w': engines[white], 'b': engines[black]},
+                               fen, time_limit, max_moves, backend, stop)
+            if record is None:
+                break
+            record.update({'game': index, 'opening': fen, 'white': white, 'black': black})
+            results.put(record)
+    finally:
+        for worker in workers.values():
+            worker.close()
+
+
+def score_for_a(record):
+    if record['result'] == '1/2-1/2':
+        return 0.5
+    white_won = record['result'] == '1-0'
+    return 1.0 if white_won == (record['white'] == 'A') else 0.0
+
+
+def elo(score):
+    """Elo difference for an expected score in (0, 1)."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+def elo_estimate(wins, draws, losses):
+    """(elo, error): Elo difference and the half-width of its 95% confidence interval."""
+    n = wins + draws + losses
+    if not n:
+        return 0.0, float('inf')
+    score = (wins + draws / 2) / n
+    var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    se = math.sqrt(var / n)
+    return elo(score), (elo(score + 1.96 * se) - elo(score - 1.96 * se)) / 2
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """Log-likelihood ratio of H1 (elo = elo1) against H0 (elo = elo0), normal approximation."""
+    n = wins + draws + losses
+    if not n:
+        return 0.0
+    score = (wins + draws / 2) / n
+    var = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    if var <= 0:
+        return 0.0
+    s0 = 1 / (1 + 10 ** (-elo0 / 400))
+    s1 = 1 / (1 + 10 ** (-elo1 / 400))
+    return (s1 - s0) * (2 * score - s0 - s1) * n / (2 * var)
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def run_tournament(engine_a, engine_b, pairs, time_limit=1.0, max_moves=200, concurrency=None,
+                   out_path='tournament.jsonl', sprt=None, alpha=0.05, beta=0.05,
+                   openings=None, opening_plies=4, seed=1, backend='mailbox', log=print):
+    """
+    Play `pairs` colour-swapped game pairs between the AI files engine_a and
+    engine_b (None = random agent). Returns a summary dict.
+    """
+    concurrency = concurrency or os.cpu_count() or 1
+    if openings is None:
+        openings = make_openings(pairs, opening_plies, seed)
+    games = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    total = 2 * pairs
+    for k in range(pairs):
+        fen = openings[k % len(openings)]
+        games.put((2 * k, fen, 'A'))
+        games.put((2 * k + 1, fen, 'B'))
+    runners = []
+    for _ in range(min(concurrency, total)):
+        games.put(None)
+        runner = multiprocessing.Process(
+            target=_runner,
+            args=({'A': engine_a, 'B': engine_b}, games, results, stop, time_limit, max_moves, backend)
+        )
+        runner.start()
+        runners.append(runner)
+
+    log(f"A: {engine_a or 'Random'}  B: {engine_b or 'Random'}")
+    log(f"{total} games, {len(runners)} in parallel, {time_limit}s per move, results -> {out_path}")
+    if sprt:
+        lower, upper = sprt_bounds(alpha, beta)
+        log(f"SPRT elo0={sprt[0]} elo1={sprt[1]} alpha={alpha} beta={beta} bounds [{lower:.2f}, {upper:.2f}]")
+
+    wins = draws = losses = played = 0
+    verdict = None
+    start = time.time()
+    try:
+        with open(out_path, 'w') as out:
+            while played < total:
+                if not any(r.is_alive() for r in runners) and results.empty():
+                    log("All runners exited early")
+                    break
+                try:
+                    record = results.get(timeout=1.0)
+                except Exception:
+                    continue
+                played += 1
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                score = score_for_a(record)
+                if score == 1.0:
+                    wins += 1
+                elif score == 0.0:
+                    losses += 1
+                else:
+                    draws += 1
+                diff, err = elo_estimate(wins, draws, losses)
+                line = (f"Game {played}/{total}: {record['white']}-{record['black']} {record['result']} "
+                        f"({record['reason']})  A +{wins} ={draws} -{losses}  Elo {diff:+.1f} +/- {err:.1f}")
+                if sprt:
+                    llr = sprt_llr(wins, draws, losses, *sprt)
+                    line += f"  LLR {llr:.2f}"
+                    if llr >= upper:
+                        verdict = 'H1'
+                    elif llr <= lower:
+                        verdict = 'H0'
+                log(line)
+                if verdict:
+                    log(f"SPRT accepts {verdict}: " + ('A is stronger' if verdict == 'H1' else 'no improvement'))
+                    break
+    finally:
+        # Stopped early or not, let every runner finish its current move and
+        # close its EngineWorkers itself; terminating it would orphan them
+        stop.set()
+        deadline = time.time() + time_limit + 4 * GRACE + 5
+        while any(r.is_alive() for r in runners) and time.time() < deadline:
+            # Keep the results pipe drained so no runner blocks flushing a record
+            try:
+                results.get(timeout=0.1)
+            except Exception:
+                pass
+        for runner in runners:
+            if runner.is_alive():
+                runner.terminate()
+            runner.join()
+
+    diff, err = elo_estimate(wins, draws, losses)
+    summary = {'games': played, 'wins': wins, 'draws': draws, 'losses': losses,
+               'elo': diff, 'error': err, 'sprt': verdict, 'seconds': time.time() - start}
+    log(f"Final: A +{wins} ={draws} -{losses} over {played} games, Elo {diff:+.1f} +/- {err:.1f}")
+    return summary
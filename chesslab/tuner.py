@@ -0,0 +1,412 @@
+"""
+Texel tuning of the evaluation's piece values and piece-square tables.
+
+The evaluation in chesslab/ai/ai.py is linear in PIECE_VALUES and the
+tables: each piece adds (or, for Black, subtracts) its value plus its
+table entry, and the king's two tables are blended by game phase. So a
+position's score is a sparse product of its features (at most 64 squares,
+two weights each) with one weight vector, and the tuner fits that vector
+to game results: it minimises the mean squared error between each result
+(1, 1/2 or 0 for White) and sigmoid(K * score), where
+
+    sigmoid(x) = 1 / (1 + 10 ** (-x / 400))
+
+and K is first fitted to the current tables. The tuned values are written
+out as Python in the same layout as ai.py, ready to paste over the old ones.
+
+Positions are kept in a dataset file that is read through np.memmap, so a
+training pass streams it in chunks and millions of positions cost little
+memory. File layout, little-endian:
+
+    header   8 bytes   MAGIC
+             4 bytes   position count N (uint32)
+             4 bytes   reserved
+    boards  N * 64 bytes, one encode_boards() row (int8) per position
+    results N bytes, the game result for White (int8: 1, 0 or -1)
+
+Datasets are built from played games (the tournament's JSON-lines output)
+or from text files with one "FEN result" line per position, the result
+being 1-0, 0-1, 1/2-1/2 or 1.0, 0.5, 0.0 (EPD lines ending in c9 "1-0"; also
+work):
+
+    python main.py --build-dataset positions.bin --dataset-games tournament.jsonl
+    python main.py --tune positions.bin --tune-out tuned_tables.py
+"""
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from .board import Board, FEN_START
+
+MAGIC = b'CLTEXEL1'
+HEADER = struct.Struct('<8sII')
+
+RESULTS = {'1-0': 1, '0-1': -1, '1/2-1/2': 0, '1.0': 1, '0.0': -1, '0.5': 0}
+
+# Weight vector layout: the values of P N B R Q, their five tables, the
+# king's middlegame and endgame tables, and one always-zero weight that
+# empty squares point at. The king's value cancels out and is not tuned.
+TUNED_PIECES = 'PNBRQ'
+TABLE_NAMES = {'P': 'PAWN_TABLE', 'N': 'KNIGHT_TABLE', 'B': 'BISHOP_TABLE',
+               'R': 'ROOK_TABLE', 'Q': 'QUEEN_TABLE'}
+TABLES = len(TUNED_PIECES)
+KING_MG = TABLES + TABLES * 64
+KING_EG = KING_MG + 64
+EMPTY = KING_EG + 64
+WEIGHTS = EMPTY + 1
+
+# Positions per gradient step; a dataset is streamed this many rows at a time
+TUNE_BATCH = 1 << 14
+# Positions at the start of a game left out of a dataset (book moves)
+SKIP_PLIES = 8
+# Checks in the evaluation, a fixed term the tuner does not fit
+CHECK_BONUS = 50
+
+
+class Dataset:
+    """A memory-mapped dataset file: `boards` (N, 64) and `results` (N,), both int8."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+        magic, self.count, _ = HEADER.unpack(header) if len(header) == HEADER.size else (None, 0, 0)
+        if magic != MAGIC or os.path.getsize(path) < HEADER.size + 65 * self.count:
+            raise ValueError(f"{path}: not a ChessLab tuning dataset")
+        if self.count:
+            self.boards = np.memmap(path, np.int8, 'r', HEADER.size, (self.count, 64))
+            self.results = np.memmap(path, np.int8, 'r', HEADER.size + 64 * self.count, (self.count,))
+        else:
+            self.boards = np.zeros((0, 64), dtype=np.int8)
+            self.results = np.zeros(0, dtype=np.int8)
+
+    def __len__(self):
+        return self.count
+
+
+def write_dataset(path, chunks):
+    """
+    Write the dataset file at path from an iterable of (boards, results)
+    array pairs, which are written out as they come. Returns the position count.
+    """
+    tmp = path + '.tmp'
+    results = []
+    count = 0
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        for boards, result in chunks:
+            f.write(np.ascontiguousarray(boards, dtype=np.int8).tobytes())
+            results.append(np.asarray(result, dtype=np.int8))
+            count += len(boards)
+        if count >= 1 << 32:
+            raise ValueError(f"{path}: too many positions ({count})")
+        for result in results:
+            f.write(result.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, count, 0))
+    os.replace(tmp, path)
+    return count
+
+
+def positions_from_games(path, skip_plies=SKIP_PLIES):
+    """(boards, results) from the games in a JSON-lines file, one game at a time."""
+    from .ai import ai
+    from .book import parse_move
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            result = RESULTS.get(record.get('result'))
+            if result is None:
+                continue
+            board = Board.from_fen(record.get('opening') or FEN_START)
+            boards = []
+            noisy = False
+            for ply, name in enumerate(record.get('moves', [])):
+                # Right after a capture or promotion, or in check, the material
+                # is still changing, which a static evaluation cannot see
+                if ply >= skip_plies and not noisy and not board.in_check():
+                    boards.append(board.clone())
+                move = parse_move(board, name)
+                if move is None:
+                    # A forfeited turn ('0000') or a game from different rules
+                    break
+                r, c = move.dst
+                noisy = board.board[r][c] is not None or move.promote is not None
+                board.make(move)
+            if boards:
+                yield ai.encode_boards(boards), np.full(len(boards), result, dtype=np.int8)
+
+
+def positions_from_fens(path, block=4096):
+    """(boards, results) from a text file of "FEN result" lines, `block` lines at a time."""
+    from .ai import ai
+    boards, results = [], []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fen, _, result = line.rpartition(' ')
+            result = RESULTS.get(result.strip('";'))
+            if result is None:
+                raise ValueError(f"{path}: no game result in {line!r}")
+            # from_fen reads the first two fields, so an EPD opcode like c9 is ignored
+            boards.append(Board.from_fen(fen))
+            results.append(result)
+            if len(boards) == block:
+                yield ai.encode_boards(boards), np.array(results, dtype=np.int8)
+                boards, results = [], []
+    if boards:
+        yield ai.encode_boards(boards), np.array(results, dtype=np.int8)
+
+
+def build_dataset(path, sources, skip_plies=SKIP_PLIES, out=print):
+    """
+    Build the dataset file at path from game files (.jsonl, whose quiet
+    positions after the first skip_plies plies are used) and "FEN result"
+    text files (all positions used). Returns the position count.
+    """
+    def chunks():
+        for source in sources:
+            if source.endswith('.jsonl'):
+                yield from positions_from_games(source, skip_plies)
+            else:
+                yield from positions_from_fens(source)
+
+    start = time.perf_counter()
+    count = write_dataset(path, chunks())
+    out(f"Wrote {count} positions to {path} in {time.perf_counter() - start:.1f}s")
+    return count
+
+
+def initial_weights(module=None):
+    """The weight vector (float64) holding a module's current PIECE_VALUES and tables."""
+    if module is None:
+        from .ai import ai as module
+    weights = np.zeros(WEIGHTS)
+    for i, piece in enumerate(TUNED_PIECES):
+        weights[i] = module.PIECE_VALUES[piece]
+        weights[TABLES + 64 * i:TABLES + 64 * (i + 1)] = np.ravel(getattr(module, TABLE_NAMES[piece]))
+    weights[KING_MG:KING_EG] = np.ravel(module.KING_MIDDLE_GAME_TABLE)
+    weights[KING_EG:EMPTY] = np.ravel(module.KING_END_GAME_TABLE)
+    return weights
+
+
+def _feature_tables():
+    """
+    Flat lookup tables by (code + 6) * 64 + square for features(): each
+    square's two weight indices, its piece's sign, and the sign again for kings.
+    """
+    index1 = np.full((13, 64), EMPTY, dtype=np.intp)
+    index2 = np.full((13, 64), EMPTY, dtype=np.intp)
+    sign = np.zeros((13, 64), dtype=np.float32)
+    king = np.zeros((13, 64), dtype=np.float32)
+    for code in range(-6, 7):
+        if not code:
+            continue
+        kind = abs(code) - 1
+        # The table square as seen from the piece's own side: Black flips the row
+        square = np.arange(64) if code > 0 else np.arange(64) ^ 56
+        if kind == 5:
+            index1[code + 6] = KING_MG + square
+            index2[code + 6] = KING_EG + square
+            king[code + 6] = np.sign(code)
+        else:
+            index1[code + 6] = kind
+            index2[code + 6] = TABLES + 64 * kind + square
+        sign[code + 6] = np.sign(code)
+    return index1.ravel(), index2.ravel(), sign.ravel(), king.ravel()
+
+
+_INDEX1, _INDEX2, _SIGN, _KING_SIGN = _feature_tables()
+_SQUARES = np.arange(64) + 6 * 64
+
+
+def features(chunk):
+    """
+    The sparse features of an int8 (N, 64) chunk of positions: every square
+    adds coef1 * w[index1] + coef2 * w[index2] to the score, where w is the
+    weight vector, and each position adds its offset (the check terms). A
+    piece's indices are its value and its table entry (coefficients +1 for
+    White, -1 for Black); a king's are its two table entries, weighted by
+    phase / PHASE_MAX and the rest. Returns (index1, coef1, index2, coef2)
+    as (N, 64) arrays and offset as (N,).
+    """
+    from .ai import ai
+    flat = chunk.astype(np.intp) * 64 + _SQUARES
+    phase = np.minimum(ai.BATCH_TABLES[2][chunk + 6].sum(axis=1), ai.PHASE_MAX) / ai.PHASE_MAX
+    phase = phase.astype(np.float32)[:, None]
+    sign = _SIGN[flat]
+    king = _KING_SIGN[flat]
+    coef1 = sign + king * (phase - 1)
+    coef2 = sign - king * phase
+    occupied = ai._bitboards(chunk != 0)
+    offset = CHECK_BONUS * (ai._kings_in_check(chunk, occupied, -1).astype(np.float32)
+                            - ai._kings_in_check(chunk, occupied, 1))
+    return _INDEX1[flat], coef1, _INDEX2[flat], coef2, offset
+
+
+def scores(feats, weights):
+    """The evaluation of each position of features(chunk) under weights."""
+    index1, coef1, index2, coef2, offset = feats
+    return (coef1 * weights[index1] + coef2 * weights[index2]).sum(axis=1) + offset
+
+
+def _targets(results):
+    return (np.asarray(results, dtype=np.float32) + 1) / 2
+
+
+def _sigmoid(k, score):
+    return 1 / (1 + np.power(10.0, -k * score / 400))
+
+
+def dataset_scores(dataset, weights):
+    """float64 (N,) evaluation of every dataset position under weights."""
+    out = np.empty(len(dataset))
+    for start in range(0, len(dataset), TUNE_BATCH):
+        chunk = np.asarray(dataset.boards[start:start + TUNE_BATCH])
+        out[start:start + len(chunk)] = scores(features(chunk), weights)
+    return out
+
+
+def loss(k, score, target):
+    """Mean squared error of sigmoid(k * score) against the results."""
+    return float(np.mean((target - _sigmoid(k, score)) ** 2))
+
+
+def fit_k(score, target, lo=0.05, hi=5.0, iterations=40):
+    """The K that minimises loss for fixed scores (golden-section search)."""
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    fa, fb = loss(a, score, target), loss(b, score, target)
+    for _ in range(iterations):
+        if fa < fb:
+            hi, b, fb = b, a, fa
+            a = hi - ratio * (hi - lo)
+            fa = loss(a, score, target)
+        else:
+            lo, a, fa = a, b, fb
+            b = lo + ratio * (hi - lo)
+            fb = loss(b, score, target)
+    return (lo + hi) / 2
+
+
+def gradient(feats, weights, k, target):
+    """(loss, d loss / d weights) over one chunk's features."""
+    index1, coef1, index2, coef2, _ = feats
+    predicted = _sigmoid(k, scores(feats, weights))
+    error = predicted - target
+    # d/dscore of (target - sigmoid(k * score)) ** 2, averaged over the chunk
+    slope = (2 * np.log(10) * k / 400 / len(target)) * error * predicted * (1 - predicted)
+    slope = slope[:, None]
+    grad = np.bincount(index1.ravel(), (coef1 * slope).ravel(), WEIGHTS)
+    grad += np.bincount(index2.ravel(), (coef2 * slope).ravel(), WEIGHTS)
+    grad[EMPTY] = 0
+    return float(np.mean(error ** 2)), grad
+
+
+def tune(dataset, weights, k, epochs=10, rate=1.0, seed=1, out=print):
+    """
+    Fit weights to the dataset by Adam, one step per TUNE_BATCH positions,
+    taking the batches in a new random order each epoch. `rate` is the
+    step size in centipawns. Returns the tuned weights.
+    """
+    weights = weights.copy()
+    moment = np.zeros(WEIGHTS)
+    scale = np.zeros(WEIGHTS)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(seed)
+    starts = np.arange(0, len(dataset), TUNE_BATCH)
+    step = 0
+    for epoch in range(epochs):
+        begin = time.perf_counter()
+        total = 0.0
+        for start in rng.permutation(starts):
+            chunk = np.asarray(dataset.boards[start:start + TUNE_BATCH])
+            target = _targets(dataset.results[start:start + TUNE_BATCH])
+            error, grad = gradient(features(chunk), weights, k, target)
+            total += error * len(chunk)
+            step += 1
+            moment = beta1 * moment + (1 - beta1) * grad
+            scale = beta2 * scale + (1 - beta2) * grad * grad
+            weights -= rate * (moment / (1 - beta1 ** step)) / (np.sqrt(scale / (1 - beta2 ** step)) + epsilon)
+        out(f"Epoch {epoch + 1}/{epochs}: loss {total / len(dataset):.6f} "
+            f"({time.perf_counter() - begin:.1f}s)")
+    return weights
+
+
+def normalise(weights, reference):
+    """
+    Move each piece's average table entry into its value, keeping the
+    averages of reference (e.g. initial_weights()); every score stays the
+    same. Pawns never stand on the first or last row, so those entries
+    are left out of the pawn average.
+    """
+    weights = weights.copy()
+    for i in range(TABLES):
+        table = slice(TABLES + 64 * i, TABLES + 64 * (i + 1))
+        used = np.ones(64, dtype=bool)
+        if TUNED_PIECES[i] == 'P':
+            used[:8] = used[56:] = False
+        shift = weights[table][used].mean() - reference[table][used].mean()
+        weights[table] -= shift * used
+        weights[i] += shift
+    return weights
+
+
+def format_tables(weights, king_value=20000):
+    """Python source for PIECE_VALUES and the tables of weights, laid out as in ai.py."""
+    values = np.rint(weights).astype(int)
+    lines = ['# Piece values', 'PIECE_VALUES = {']
+    for i, piece in enumerate(TUNED_PIECES):
+        lines.append(f"    '{piece}': {values[i]},")
+    lines += [f"    'K': {king_value}", '}', '',
+              "# Black's score is found by flipping the row: table[7 - r][c]", '']
+
+    def table(name, start):
+        rows = values[start:start + 64].reshape(8, 8)
+        lines.append(f'{name} = [')
+        lines.append(',\n'.join('    [' + ','.join(f'{v:4d}' for v in row) + ']' for row in rows))
+        lines.extend([']', ''])
+
+    for i, piece in enumerate(TUNED_PIECES):
+        table(TABLE_NAMES[piece], TABLES + 64 * i)
+    table('KING_MIDDLE_GAME_TABLE', KING_MG)
+    table('KING_END_GAME_TABLE', KING_EG)
+    return '\n'.join(lines)
+
+
+def run_tuner(dataset_path, out_path='tuned_tables.py', epochs=10, rate=1.0, seed=1, out=print):
+    """
+    Tune the tables of chesslab/ai/ai.py on the dataset file and write them
+    to out_path. Returns the tuned weight vector.
+    """
+    from .ai import ai
+    dataset = Dataset(dataset_path)
+    if not len(dataset):
+        raise ValueError(f"{dataset_path}: no positions")
+    start = time.perf_counter()
+    reference = initial_weights(ai)
+    target = _targets(dataset.results)
+    score = dataset_scores(dataset, reference)
+    k = fit_k(score, target)
+    before = loss(k, score, target)
+    out(f"{len(dataset)} positions, K = {k:.4f}, loss {before:.6f}")
+    weights = normalise(tune(dataset, reference, k, epochs=epochs, rate=rate, seed=seed, out=out), reference)
+    after = loss(k, dataset_scores(dataset, np.rint(weights)), target)
+    out(f"Loss {before:.6f} -> {after:.6f} with the tables rounded "
+        f"({time.perf_counter() - start:.1f}s)")
+    tmp = out_path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(f'# Tuned on {dataset_path} ({len(dataset)} positions, K = {k:.4f}, loss {after:.6f});\n'
+                '# paste over PIECE_VALUES and the tables in chesslab/ai/ai.py\n\n')
+        f.write(format_tables(weights, ai.PIECE_VALUES['K']))
+    os.replace(tmp, out_path)
+    out(f"Tuned tables written to {out_path}")
+    return weights
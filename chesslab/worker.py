@@ -0,0 +1,321 @@
+"""
+Long-lived engine worker processes for the match harness.
+
+Starting a fresh process for every move costs a spawn, an import of the AI
+module and a pickled Board each time. An EngineWorker instead starts one
+process per side when the game begins, loads the AI module there once, and
+then sends it each position over a pipe, as the game's first position (a
+FEN string) and the moves played since, so the worker's board has the
+same move history as the caller's.
+
+At the deadline the worker interrupts its own search: a timer thread
+raises SearchTimeout in the search thread, so the process stays warm for
+the next move. The process is only killed and respawned if it crashes or
+fails to answer within a short grace period after the deadline.
+"""
+import _thread
+import importlib
+import importlib.util
+import inspect
+import multiprocessing
+import signal
+import threading
+import time
+
+from .board import Board, Move
+
+# How long after the deadline a worker may take to report before it is replaced
+GRACE = 0.5
+READY_TIMEOUT = 30.0
+
+
+class SearchTimeout(BaseException):
+    """Raised inside the worker's search at the deadline (a BaseException so `except Exception` in an AI does not swallow it)."""
+
+
+def load_ai_function(path, module_name, func_name):
+    """Import the AI function, from a file path (like the harness loaders) or a module name."""
+    if path is None:
+        module = importlib.import_module(module_name)
+    else:
+        # Set up package context for relative imports
+        spec = importlib.util.spec_from_file_location(
+            "chesslab.ai.custom_ai",
+            path,
+            submodule_search_locations=[]
+        )
+        module = importlib.util.module_from_spec(spec)
+        module.__package__ = "chesslab.ai"
+        spec.loader.exec_module(module)
+    return getattr(module, func_name)
+
+
+def _pack(move):
+    """Serializable (src, dst, promote) triple for a Move, or None."""
+    if move is None:
+        return None
+    return (move.src, move.dst, getattr(move, 'promote', None))
+
+
+def game_record(board):
+    """(FEN, packed moves) of board's first position and the moves since; None for a passed turn."""
+    root = board.clone()
+    moves = []
+    while root.history:
+        move = root.history[-1][0]
+        if move is None:
+            root.unmake_null()
+        else:
+            root.unmake()
+        moves.append(_pack(move))
+    moves.reverse()
+    return root.fen(), moves
+
+
+def replay_game(fen, moves, backend):
+    """The board game_record() describes."""
+    board = Board.from_fen(fen, backend)
+    for move in moves:
+        if move is None:
+            board.make_null()
+        else:
+            board.make(Move(*move))
+    return board
+
+
+def _serve(conn, path, module_name, func_name):
+    """Worker process main loop: load the AI once, then answer search requests until told to quit."""
+    state = {'searching': False, 'expired': False, 'metrics': None}
+
+    def on_deadline(signum, frame):
+        # Runs in the search thread, so it can only interrupt the search it was armed for
+        state['expired'] = True
+        if state['searching']:
+            raise SearchTimeout()
+
+    signal.signal(signal.SIGINT, on_deadline)
+    try:
+        ai_func = load_ai_function(path, module_name, func_name)
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+        return
+    try:
+        accepts_metrics = 'metrics' in inspect.signature(ai_func).parameters
+    except (TypeError, ValueError):
+        accepts_metrics = False
+    conn.send(('ready', None))
+
+    def send_move(move):
+        # Never interrupt a message half way through the pipe
+        state['searching'] = False
+        conn.send(('move', _pack(move)))
+        state['searching'] = True
+        if state['expired']:
+            raise SearchTimeout()
+
+    def search(kind, board, kwargs):
+        metrics = {} if 'metrics' in kwargs else None
+        state['metrics'] = metrics
+        if kind == 'gen':
+            # Generators are called with the board alone unless they take metrics
+            gen = ai_func(board, metrics=metrics) if metrics is not None and accepts_metrics else ai_func(board)
+            for move in gen:
+                if move is not None:
+                    send_move(move)
+            return ('done', (True, metrics))
+        if metrics is not None:
+            kwargs['metrics'] = metrics
+        ret = ai_func(board, **kwargs)
+        move = ret[0] if isinstance(ret, tuple) else ret
+        if metrics is not None and isinstance(ret, tuple) and len(ret) > 1:
+            metrics.setdefault('nodes', ret[1])
+        return ('result', (_pack(move), metrics))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg[0] == 'quit':
+            return
+        _, kind, (fen, moves), backend, timeout, kwargs = msg
+        timer = threading.Timer(timeout, _thread.interrupt_main)
+        timer.daemon = True
+        try:
+            try:
+                board = replay_game(fen, moves, backend)
+                state['expired'] = False
+                state['searching'] = True
+                timer.start()
+                reply = search(kind, board, kwargs)
+            finally:
+                state['searching'] = False
+                timer.cancel()
+        except SearchTimeout:
+            # A generator's metrics so far still describe the search it did
+            reply = ('done', (False, state['metrics'])) if kind == 'gen' else ('timeout', None)
+        except Exception as e:
+            reply = ('error', f"{type(e).__name__}: {str(e)}")
+        try:
+            conn.send(reply)
+        except OSError:
+            # The harness went away mid-search
+            return
+
+
+class EngineWorker:
+    """
+    A persistent process that runs one AI function.
+
+    `func` is the AI function as loaded by the harness; `path` is the file it
+    was loaded from (None for functions importable by module name). The
+    run_generator/run_function methods return the same tuples as the
+    harness's old per-move helpers.
+    """
+
+    def __init__(self, func, path=None):
+        self.path = path
+        self.module_name = func.__module__
+        self.func_name = func.__name__
+        self.process = None
+        self.conn = None
+        self.spawns = 0
+
+    def start(self):
+        """Spawn the process and wait until it has loaded the AI module."""
+        self.spawns += 1
+        parent_conn, child_conn = multiprocessing.Pipe()
+        # Not a daemon, so the AI may start processes of its own; close() cleans it up
+        self.process = multiprocessing.Process(
+            target=_serve,
+            args=(child_conn, self.path, self.module_name, self.func_name)
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        if not parent_conn.poll(READY_TIMEOUT):
+            self._kill()
+            raise RuntimeError(f"AI worker for {self.func_name} did not start")
+        msg_type, value = parent_conn.recv()
+        if msg_type != 'ready':
+            self._kill()
+            raise RuntimeError(f"AI worker for {self.func_name} failed to load: {value}")
+        return self
+
+    @property
+    def restarts(self):
+        """How many times the process had to be replaced after a crash or overrun."""
+        return max(0, self.spawns - 1)
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def close(self):
+        """Ask the process to exit, killing it if it does not."""
+        if self.process is None:
+            return
+        try:
+            self.conn.send(('quit',))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=GRACE)
+        self._kill()
+
+    def _kill(self):
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=GRACE)
+                if self.process.is_alive():
+                    self.process.kill()
+                    self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def _request(self, kind, board, timeout, kwargs):
+        if not self.alive():
+            # Not started yet, or the last search crashed or overran
+            self._kill()
+            self.start()
+        self.conn.send(('go', kind, game_record(board), board.backend, timeout, kwargs))
+
+    def _recv(self, until):
+        """Next message from the worker, or None if nothing arrives before time `until`."""
+        if not self.conn.poll(max(0.0, until - time.time())):
+            return None
+        return self.conn.recv()
+
+    def run_generator(self, board, timeout, metrics=None):
+        """
+        Run a generator AI on board for up to timeout seconds.
+        Returns (move, moves_yielded, elapsed, completed, error). A `metrics`
+        dict is filled in if the generator takes a metrics argument.
+        """
+        start_time = time.time()
+        deadline = start_time + timeout
+        last_move = None
+        moves_yielded = 0
+        error = None
+        completed = False
+        try:
+            self._request('gen', board, timeout, {} if metrics is None else {'metrics': True})
+            while True:
+                msg = self._recv(deadline + GRACE)
+                if msg is None:
+                    # Overran the deadline without stopping
+                    self._kill()
+                    break
+                msg_type, value = msg
+                if msg_type == 'move':
+                    # Moves that arrive after the deadline do not count
+                    if time.time() <= deadline:
+                        last_move = Move(*value)
+                        moves_yielded += 1
+                elif msg_type == 'done':
+                    # False when the search was interrupted at the deadline
+                    completed, worker_metrics = value
+                    if metrics is not None and worker_metrics:
+                        metrics.update(worker_metrics)
+                    break
+                elif msg_type == 'error':
+                    error = value
+                    break
+        except (EOFError, OSError):
+            self._kill()
+            error = "AI worker crashed"
+        elapsed = time.time() - start_time
+        return last_move, moves_yielded, elapsed, completed, error
+
+    def run_function(self, board, timeout, **kwargs):
+        """
+        Run a function AI on board for up to timeout seconds.
+        Returns (move, elapsed, completed, error); metrics passed in kwargs are filled in.
+        """
+        start_time = time.time()
+        move = None
+        error = None
+        completed = False
+        metrics = kwargs.get('metrics')
+        try:
+            self._request('call', board, timeout, kwargs)
+            msg = self._recv(start_time + timeout + GRACE)
+            if msg is None:
+                self._kill()
+                return None, time.time() - start_time, False, "Timeout"
+            msg_type, value = msg
+            if msg_type == 'timeout':
+                return None, time.time() - start_time, False, "Timeout"
+            if msg_type == 'result':
+                packed, worker_metrics = value
+                if packed is not None:
+                    move = Move(*packed)
+                if metrics is not None and worker_metrics:
+                    metrics.update(worker_metrics)
+            elif msg_type == 'error':
+                error = value
+            completed = True
+        except (EOFError, OSError):
+            self._kill()
+            error = "AI worker crashed"
+        return move, time.time() - start_time, completed, error
@@ -1,12 +1,14 @@
 import argparse
+import os
 
-def run_headless(white_ai_path, black_ai_path, time_limit, max_moves):
+def run_headless(white_ai_path, black_ai_path, time_limit, max_moves, backend='mailbox'):
     """Run AI vs AI match without GUI."""
-    import time
     import importlib.util
     import inspect
     from chesslab.board import Board
     from chesslab.ai import random_agent
+    from chesslab.worker import EngineWorker
+    from chesslab.common.profiling import format_search_metrics
 
     def load_ai_module(path):
         if path is None:
@@ -39,126 +41,6 @@ def run_headless(white_ai_path, black_ai_path, time_limit, max_moves):
             return module.choose_random_move, 'Random'
         return None, None
 
-    def _run_generator_in_process(ai_func, board, result_queue):
-        """Worker function for generator AI - runs in separate process."""
-        try:
-            gen = ai_func(board)
-            for move in gen:
-                if move is not None:
-                    result_queue.put(('move', (move.src, move.dst, getattr(move, 'promotion', None))))
-            result_queue.put(('done', None))
-        except Exception as e:
-            result_queue.put(('error', f"{type(e).__name__}: {str(e)}"))
-
-    def _run_function_in_process(ai_func, board, result_queue, kwargs):
-        """Worker function for regular AI - runs in separate process."""
-        try:
-            ret = ai_func(board, **kwargs)
-            if isinstance(ret, tuple):
-                move = ret[0]
-            else:
-                move = ret
-            if move is not None:
-                result_queue.put(('result', (move.src, move.dst, getattr(move, 'promotion', None))))
-            else:
-                result_queue.put(('result', None))
-        except Exception as e:
-            result_queue.put(('error', f"{type(e).__name__}: {str(e)}"))
-
-    def run_generator_with_timeout(ai_func, board, timeout):
-        """Run a generator AI with timeout using multiprocessing."""
-        import multiprocessing
-        from chesslab.board import Move
-
-        result_queue = multiprocessing.Queue()
-        process = multiprocessing.Process(
-            target=_run_generator_in_process,
-            args=(ai_func, board, result_queue)
-        )
-
-        start_time = time.time()
-        process.start()
-
-        last_move = None
-        moves_yielded = 0
-        error = None
-        completed = False
-
-        deadline = start_time + timeout
-        while True:
-            remaining = deadline - time.time()
-            if remaining <= 0:
-                break
-            try:
-                msg_type, value = result_queue.get(timeout=min(0.1, remaining))
-                if msg_type == 'move':
-                    src, dst, promotion = value
-                    last_move = Move(src, dst, promotion)
-                    moves_yielded += 1
-                elif msg_type == 'done':
-                    completed = True
-                    break
-                elif msg_type == 'error':
-                    error = value
-                    break
-            except:
-                if not process.is_alive():
-                    break
-
-        elapsed = time.time() - start_time
-
-        if process.is_alive():
-            process.terminate()
-            process.join(timeout=0.5)
-            if process.is_alive():
-                process.kill()
-
-        return last_move, moves_yielded, elapsed, completed, error
-
-    def run_function_with_timeout(ai_func, board, timeout, **kwargs):
-        """Run a function AI with timeout using multiprocessing."""
-        import multiprocessing
-        from chesslab.board import Move
-
-        result_queue = multiprocessing.Queue()
-        process = multiprocessing.Process(
-            target=_run_function_in_process,
-            args=(ai_func, board, result_queue, kwargs)
-        )
-
-        start_time = time.time()
-        process.start()
-        process.join(timeout=timeout)
-        elapsed = time.time() - start_time
-
-        move = None
-        error = None
-        completed = False
-
-        if process.is_alive():
-            process.terminate()
-            process.join(timeout=0.5)
-            if process.is_alive():
-                process.kill()
-            return None, elapsed, False, "Timeout"
-
-        # Process finished, get result
-        try:
-            if not result_queue.empty():
-                msg_type, value = result_queue.get_nowait()
-                if msg_type == 'result':
-                    if value is not None:
-                        src, dst, promotion = value
-                        move = Move(src, dst, promotion)
-                    completed = True
-                elif msg_type == 'error':
-                    error = value
-                    completed = True
-        except:
-            pass
-
-        return move, elapsed, completed, error
-
     # Load AI modules
     white_module = load_ai_module(white_ai_path)
     black_module = load_ai_module(black_ai_path)
@@ -177,59 +59,75 @@ def run_headless(white_ai_path, black_ai_path, time_limit, max_moves):
     print(f"Black: {black_ai_path or 'Random'} ({black_type})")
     print(f"Time limit: {time_limit}s per move")
     print(f"Max moves: {max_moves}")
+    print(f"Board: {backend}")
     print("-" * 50)
 
-    board = Board()
-    move_count = 0
+    # One warm process per side for the whole game; each move only sends it the position
+    def ai_source(module, path, func):
+        # The worker reloads functions from a file; fallbacks import by module name
+        return path if module is not None and getattr(module, func.__name__, None) is func else None
+
+    workers = {
+        'w': EngineWorker(white_func, ai_source(white_module, white_ai_path, white_func)).start(),
+        'b': EngineWorker(black_func, ai_source(black_module, black_ai_path, black_func)).start(),
+    }
+    try:
+        board = Board(backend=backend)
+        move_count = 0
+
+        while move_count < max_moves:
+            outcome = board.outcome()
+            if outcome:
+                kind, winner = outcome
+                if kind == 'checkmate':
+                    print(f"\nCheckmate! {'White' if winner == 'w' else 'Black'} wins.")
+                else:
+                    print(f"\nStalemate!")
+                break
 
-    while move_count < max_moves:
-        outcome = board.outcome()
-        if outcome:
-            kind, winner = outcome
-            if kind == 'checkmate':
-                print(f"\nCheckmate! {'White' if winner == 'w' else 'Black'} wins.")
+            current_color = board.turn
+            color_name = 'White' if current_color == 'w' else 'Black'
+            worker = workers[current_color]
+            ai_type = white_type if current_color == 'w' else black_type
+
+            move = None
+            forfeit = False
+            metrics = {}
+
+            if ai_type == 'IDS':
+                move, moves_yielded, elapsed, completed, error = worker.run_generator(board, time_limit, metrics=metrics)
+                if move is None and not completed:
+                    forfeit = True
+            elif ai_type in ('AlphaBeta', 'Minimax'):
+                move, elapsed, completed, error = worker.run_function(board, time_limit, depth=3, metrics=metrics)
+                if isinstance(move, tuple):
+                    move = move[0]
+                if move is None and not completed:
+                    forfeit = True
             else:
-                print(f"\nStalemate!")
-            break
-
-        current_color = board.turn
-        color_name = 'White' if current_color == 'w' else 'Black'
-        ai_func = white_func if current_color == 'w' else black_func
-        ai_type = white_type if current_color == 'w' else black_type
-
-        move = None
-        forfeit = False
-
-        if ai_type == 'IDS':
-            move, moves_yielded, elapsed, completed, error = run_generator_with_timeout(ai_func, board, time_limit)
-            if move is None and not completed:
-                forfeit = True
-        elif ai_type in ('AlphaBeta', 'Minimax'):
-            move, elapsed, completed, error = run_function_with_timeout(ai_func, board.clone(), time_limit, depth=3, metrics={})
-            if isinstance(move, tuple):
-                move = move[0]
-            if move is None and not completed:
-                forfeit = True
-        else:
-            move, elapsed, completed, error = run_function_with_timeout(ai_func, board.clone(), time_limit)
-            if move is None and not completed:
-                forfeit = True
+                move, elapsed, completed, error = worker.run_function(board, time_limit)
+                if move is None and not completed:
+                    forfeit = True
+
+            if forfeit:
+                # Forfeit the move (skip turn), not the game
+                print(f"Move {move_count + 1}: {color_name} forfeits move (timeout)")
+                board.make_null()
+                move_count += 1
+                continue
+
+            if move is None:
+                winner = 'Black' if current_color == 'w' else 'White'
+                print(f"\n{color_name} returned no move. {winner} wins!")
+                break
 
-        if forfeit:
-            # Forfeit the move (skip turn), not the game
-            print(f"Move {move_count + 1}: {color_name} forfeits move (timeout)")
-            board.turn = board.enemy(board.turn)
+            board.make(move)
             move_count += 1
-            continue
-
-        if move is None:
-            winner = 'Black' if current_color == 'w' else 'White'
-            print(f"\n{color_name} returned no move. {winner} wins!")
-            break
-
-        board.make(move)
-        move_count += 1
-        print(f"Move {move_count}: {color_name} {move} ({ai_type}, {elapsed:.2f}s)")
+            stats = format_search_metrics(metrics)
+            print(f"Move {move_count}: {color_name} {move} ({ai_type}, {elapsed:.2f}s)" + (f" {stats}" if stats else ""))
+    finally:
+        for worker in workers.values():
+            worker.close()
 
     if move_count >= max_moves:
         print(f"\nDraw by move limit ({max_moves} moves).")
@@ -250,12 +148,127 @@ if __name__ == '__main__':
                         help='Time limit per move in seconds (default: 5.0)')
     parser.add_argument('--max-moves', type=int, default=200,
                         help='Maximum moves before draw (default: 200)')
+    parser.add_argument('--board', choices=['mailbox', 'bitboard'], default='mailbox',
+                        help='Board representation for headless games (default: mailbox); bitboard is an '
+                             'independent implementation of the same rules, not a faster one')
+    parser.add_argument('--search-workers', type=int, default=1,
+                        help='Processes per AI for choose_move (Lazy SMP when > 1, default: 1)')
+    parser.add_argument('--smp-report', type=int, metavar='DEPTH', default=None,
+                        help='Report Lazy SMP time-to-depth speedup for 1, 2, 4, ... up to --search-workers and exit')
+    parser.add_argument('--tournament', type=int, metavar='PAIRS', default=None,
+                        help='Play PAIRS colour-swapped game pairs, --white as engine A vs --black as engine B')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Tournament games played in parallel (default: number of cores)')
+    parser.add_argument('--out', type=str, default='tournament.jsonl',
+                        help='Tournament results file, one JSON game per line (default: tournament.jsonl)')
+    parser.add_argument('--sprt', type=float, nargs=2, metavar=('ELO0', 'ELO1'), default=None,
+                        help='Stop the tournament early once an SPRT of elo0 against elo1 decides (alpha = beta = 0.05)')
+    parser.add_argument('--openings', type=str, default=None,
+                        help='Tournament openings file, one FEN per line (default: random 4-ply openings)')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='Seed for the random tournament openings (default: 1)')
+    parser.add_argument('--perft', type=int, metavar='DEPTH', default=None,
+                        help='Count move-tree leaves to DEPTH from --fen and report nodes per second, then exit')
+    parser.add_argument('--divide', action='store_true',
+                        help='With --perft, break the count down by root move')
+    parser.add_argument('--perft-verify', action='store_true',
+                        help='Check move generation against the reference perft counts and exit')
+    parser.add_argument('--fen', type=str, default=None,
+                        help='Position for --perft (default: the starting position)')
+    parser.add_argument('--book', type=str, default=None,
+                        help='Opening book file for choose_move (default: chesslab/ai/book.bin if present)')
+    parser.add_argument('--build-book', type=str, metavar='OUT', default=None,
+                        help='Build an opening book file from --book-games, or by searching the opening tree, and exit')
+    parser.add_argument('--book-games', type=str, nargs='+', metavar='JSONL', default=None,
+                        help='Tournament result files to build the book from')
+    parser.add_argument('--book-plies', type=int, default=None,
+                        help='Book depth in plies (default: 16 from games, 6 by search)')
+    parser.add_argument('--book-depth', type=int, default=4,
+                        help='Search depth used to build a book without games (default: 4)')
+    parser.add_argument('--tablebases', type=str, metavar='DIR', default=None,
+                        help='Endgame tablebase directory for the AI (default: chesslab/ai/tablebases if present)')
+    parser.add_argument('--build-tablebases', type=str, metavar='DIR', default=None,
+                        help='Build endgame tablebases into DIR and exit')
+    parser.add_argument('--tablebase-sets', type=str, nargs='+', metavar='SET', default=None,
+                        help='Piece sets to build, e.g. KQvK KRvK KPvK KBNvK (the default) or KQvKR')
+    parser.add_argument('--build-dataset', type=str, metavar='OUT', default=None,
+                        help='Build a tuning dataset file from --dataset-games and exit')
+    parser.add_argument('--dataset-games', type=str, nargs='+', metavar='FILE', default=None,
+                        help='Tournament result files (.jsonl) or "FEN result" text files for --build-dataset')
+    parser.add_argument('--tune', type=str, metavar='DATASET', default=None,
+                        help='Tune the piece values and tables of chesslab/ai/ai.py on DATASET and exit')
+    parser.add_argument('--tune-out', type=str, default='tuned_tables.py',
+                        help='File the tuned tables are written to (default: tuned_tables.py)')
+    parser.add_argument('--tune-epochs', type=int, default=10,
+                        help='Passes over the dataset (default: 10)')
+    parser.add_argument('--tune-rate', type=float, default=1.0,
+                        help='Tuner step size in centipawns (default: 1.0)')
+    parser.add_argument('--bench', type=str, nargs='?', const='bench.json', metavar='OUT', default=None,
+                        help='Time the searches in --white (default: chesslab/ai/ai.py) on fixed positions, '
+                             'write JSON to OUT (default: bench.json) and exit')
+    parser.add_argument('--bench-repeat', type=int, default=1,
+                        help='Run each benchmark search this many times and keep the fastest (default: 1)')
+    parser.add_argument('--bench-compare', type=str, nargs=2, metavar=('OLD', 'NEW'), default=None,
+                        help='Compare two --bench result files and exit')
     args = parser.parse_args()
 
-    if args.gui or (args.white is None and args.black is None):
+    # Read by chesslab/ai/ai.py in the AI worker processes
+    os.environ['CHESSLAB_SEARCH_WORKERS'] = str(args.search_workers)
+    if args.book:
+        os.environ['CHESSLAB_BOOK'] = os.path.abspath(args.book)
+    if args.tablebases:
+        os.environ['CHESSLAB_TABLEBASES'] = os.path.abspath(args.tablebases)
+
+    if args.build_book:
+        from chesslab.book import build_book
+        build_book(args.build_book, games=args.book_games, plies=args.book_plies, depth=args.book_depth)
+    elif args.build_tablebases:
+        from chesslab.tablebase import build_tablebases, DEFAULT_SETS
+        build_tablebases(args.build_tablebases, args.tablebase_sets or DEFAULT_SETS)
+    elif args.build_dataset:
+        from chesslab.tuner import build_dataset
+        if not args.dataset_games:
+            parser.error('--build-dataset needs --dataset-games')
+        build_dataset(args.build_dataset, args.dataset_games)
+    elif args.tune:
+        from chesslab.tuner import run_tuner
+        run_tuner(args.tune, args.tune_out, epochs=args.tune_epochs, rate=args.tune_rate, seed=args.seed)
+    elif args.bench_compare:
+        from chesslab.bench import compare
+        compare(*args.bench_compare)
+    elif args.bench is not None:
+        from chesslab.bench import run_bench, DEFAULT_AI
+        run_bench(args.bench, ai_path=args.white or DEFAULT_AI, backend=args.board, repeat=args.bench_repeat)
+    elif args.perft is not None or args.perft_verify:
+        # perft splits its root across --search-workers processes
+        from chesslab import perft
+        if args.perft_verify:
+            ok = perft.verify(workers=args.search_workers, backend=args.board)
+            print('All counts match' if ok else 'Move generation MISMATCH')
+        else:
+            perft.run_perft(args.fen or perft.FEN_START, args.perft, divide_moves=args.divide,
+                            workers=args.search_workers, backend=args.board)
+    elif args.tournament is not None:
+        from chesslab.tournament import run_tournament
+        openings = None
+        if args.openings:
+            with open(args.openings) as f:
+                openings = [line.strip() for line in f if line.strip()]
+        run_tournament(args.white, args.black, args.tournament, time_limit=args.time,
+                       max_moves=args.max_moves, concurrency=args.concurrency, out_path=args.out,
+                       sprt=args.sprt, openings=openings, seed=args.seed, backend=args.board)
+    elif args.smp_report is not None:
+        from chesslab.ai.smp import time_to_depth_report
+        counts = [1]
+        while counts[-1] * 2 <= args.search_workers:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != args.search_workers and args.search_workers > 1:
+            counts.append(args.search_workers)
+        time_to_depth_report(depth=args.smp_report, worker_counts=counts)
+    elif args.gui or (args.white is None and args.black is None):
         # Launch GUI
         from chesslab.gui import main
         main(white_ai=args.white, black_ai=args.black, time_limit=args.time)
     else:
         # Run headless AI vs AI
-        run_headless(args.white, args.black, args.time, args.max_moves)
\ No newline at end of file
+        run_headless(args.white, args.black, args.time, args.max_moves, args.board)
\ No newline at end of file
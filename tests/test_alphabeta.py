@@ -0,0 +1,72 @@
+"""choose_alphabeta_move must stay an exact search: the same root value as plain minimax."""
+import pytest
+
+from chesslab.board import Board
+from chesslab.ai import ai
+
+POSITIONS = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w", 2),
+    ("r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w", 2),
+    ("r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b", 2),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w", 3),
+    ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w", 3),
+    # Forward pruning changes the value of these at depth 3
+    ("rnbqkb1r/p2pppp1/5n2/1pp4p/7P/3PP3/PPP2PP1/RNBQKBNR b", 3),
+    ("rnbq1b1r/1ppp1kpp/1n3p2/p3p3/P6N/3PP3/RP3PPP/1NBQKB1R b", 3),
+]
+
+
+@pytest.fixture(autouse=True)
+def no_tables(monkeypatch):
+    # Search only: no opening book or endgame tablebase answers
+    monkeypatch.setattr(ai, '_BOOK', False)
+    monkeypatch.setattr(ai, '_TABLEBASES', False)
+
+
+# A depth 0 search goes straight to quiescence and stores nothing, so one engine serves every leaf
+LEAF_ENGINE = ai.Engine(tt_size_mb=1)
+
+
+def leaf(board):
+    """The quiescence value the search uses at depth 0."""
+    ai.choose_alphabeta_move(board, 0, engine=LEAF_ENGINE)
+    return LEAF_ENGINE.score
+
+
+def minimax(board, depth):
+    """Plain minimax with choose_alphabeta_move's mate scores and leaves."""
+    outcome = board.outcome()
+    if outcome:
+        if outcome[0] == 'checkmate':
+            return 1000000 + depth if outcome[1] == 'w' else -1000000 - depth
+        return 0
+    if depth == 0:
+        return leaf(board)
+    values = []
+    for move in board.legal_moves():
+        board.make(move)
+        values.append(minimax(board, depth - 1))
+        board.unmake()
+    return max(values) if board.turn == 'w' else min(values)
+
+
+@pytest.mark.parametrize("fen, depth", POSITIONS)
+def test_alphabeta_matches_minimax(fen, depth):
+    board = Board.from_fen(fen)
+    engine = ai.Engine(tt_size_mb=1)
+    move, _ = ai.choose_alphabeta_move(board, depth, engine=engine)
+    expected = minimax(board, depth)
+    assert engine.score == expected
+    board.make(move)
+    assert minimax(board, depth - 1) == expected
+
+
+def test_module_engine_defaults_are_exact():
+    # The shared ENGINE carries the pruning switches and the TT of choose_move's
+    # pruned searches; neither may reach a plain call
+    board = Board.from_fen(POSITIONS[-1][0])
+    ai.ENGINE.reset()
+    for _ in ai.choose_move(board, max_depth=3):
+        pass
+    ai.choose_alphabeta_move(board, 3)
+    assert ai.ENGINE.score == minimax(board, 3)